@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Stand-in FOS REST server with synthetic payloads for checks and benchmarks.
+
+    benchmarks/mockfos.py --port 8443 --ports 384 --vfs 4 --latency 0.05
+
+    check_brocade interface-health -H 127.0.0.1 -P 8443 -u admin -p password
+
+Implements /rest/login, /rest/logout and the endpoints of the brocadecmd
+modules. Ports are spread over the virtual fabrics, every 7th port is
+offline and every 11th disabled. Without --cert/--key a self signed
+certificate is created with openssl.
+
+Options for failure modes:
+    --latency      seconds per GET request
+    --token-ttl    tokens expire after these seconds idle, requests get 401
+    --max-sessions logins beyond this number of tokens get 403
+
+GET /stats returns the counters (requests, logins, ...) as JSON,
+GET /stats?reset=1 returns and resets them. They need no token.
+GET /unavailable?status=503 answers all REST requests with that status
+(e.g. a failing CP), /unavailable?status=0 ends it.
+GET /zoning?change=1 changes the effective zone configuration: a member
+and a zone are added, a zone is removed.
+GET /nameserver?logout=1&login=1 logs out the first device of every virtual
+fabric and logs in a new one.
+"""
+
+import argparse
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+API_VERSIONS = ["1.30.0", "1.40.0", "1.50.0", "1.60.0", "2.0.0", "2.0.1"]
+FOS_VERSIONS = {
+    "1.30.0": "v8.2.1b",
+    "1.40.0": "v9.0.1",
+    "1.50.0": "v9.1.0b",
+    "1.60.0": "v9.1.1",
+    "2.0.0": "v9.2.1",
+    "2.0.1": "v9.2.1b",
+}
+PORTS_PER_SLOT = 48
+
+
+class Switch:
+    """ synthetic switch state and payloads """
+
+    def __init__(self, ports=48, vfs=1, director=True, api_version="1.60.0"):
+        self.ports = ports
+        self.vfs = vfs
+        self.director = director
+        self.api_version = api_version
+        self.started = time.time()
+        # changes of the zone configuration, see /zoning
+        self.zone_changes = 0
+        # devices logged out and new devices logged in, see /nameserver
+        self.logouts = 0
+        self.logins = 0
+        self.fids = [128] if vfs == 1 else list(range(1, vfs + 1))
+
+    def port_name(self, index):
+        if self.director:
+            return f"{index // PORTS_PER_SLOT + 1}/{index % PORTS_PER_SLOT}"
+        return f"0/{index}"
+
+    def vf_ports(self, fid):
+        """ port indexes of a virtual fabric """
+        if fid not in self.fids:
+            return range(0)
+        return range(self.fids.index(fid), self.ports, self.vfs)
+
+    def chassis(self):
+        return {"chassis": {
+            "manufacturer": "Brocade",
+            "product-name": "X6-8" if self.director else "G620",
+            "vendor-part-number": "80-1012345-01 DCX" if self.director else "80-1012346-01",
+            "vendor-serial-number": "MOCK0000001",
+            "chassis-user-friendly-name": "mockfos",
+            "vf-enabled": self.vfs > 1,
+            "system-uptime": int(time.time() - self.started) + 86400,
+        }}
+
+    def version(self):
+        return {"version": {"fabric-os": FOS_VERSIONS.get(self.api_version, "v9.1.1")}}
+
+    def logical_switches(self):
+        return {"fibrechannel-logical-switch": [
+            {"fabric-id": fid, "port-index-members": {"port-index": list(self.vf_ports(fid))}}
+            for fid in self.fids
+        ]}
+
+    def fibrechannel(self, fid):
+        # FabricOS >= 9.1.0 has the status strings
+        strings = API_VERSIONS.index(self.api_version) >= API_VERSIONS.index("1.50.0")
+        ports = []
+        for i in self.vf_ports(fid):
+            e_port = i % 8 == 0
+            online = i % 7 != 0
+            port = {
+                "name": self.port_name(i),
+                "user-friendly-name": f"port{i}",
+                "port-type": 7 if e_port else 15,
+                "operational-status": 2 if online else 3,
+                "is-enabled-state": i % 11 != 0,
+                "port-scn": "e-port" if e_port else "f-port",
+                "port-health": "healthy" if online else "offline",
+                "speed": 32000000000,
+                "max-speed": 32000000000,
+                "wwn": f"20:{i // 256:02x}:{i % 256:02x}:00:00:00:00:01",
+            }
+            if strings:
+                port["port-type-string"] = "e-port" if e_port else "f-port"
+                port["operational-status-string"] = "online" if online else "offline"
+            ports.append(port)
+        return {"fibrechannel": ports}
+
+    def statistics(self, fid):
+        now = time.time()
+        elapsed = now - self.started
+        stats = []
+        for i in self.vf_ports(fid):
+            # every 13th port has growing crc errors, traffic grows on all ports
+            errors = int(elapsed * 0.5) if i % 13 == 0 else 0
+            octets = int(elapsed * (i % 10 + 1) * 10 ** 7)
+            stats.append({
+                "name": self.port_name(i),
+                "time-generated": int(now),
+                "crc-errors": errors,
+                "in-crc-errors": errors,
+                "link-failures": 1 if i % 13 == 0 else 0,
+                "loss-of-sync": 0,
+                "loss-of-signal": 0,
+                "invalid-transmission-words": errors * 2,
+                "in-frames": octets // 2048,
+                "out-frames": octets // 4096,
+                "in-octets": octets,
+                "out-octets": octets // 2,
+            })
+        return {"fibrechannel-statistics": stats}
+
+    def media(self, fid):
+        # every 9th port has no SFP, every 17th a weak receive power
+        limits = {
+            "temperature-alert": (85, -5, 75, 0),
+            "rx-power-alert": (1995.3, 31.6, 1584.9, 50.1),
+            "tx-power-alert": (1778.3, 158.5, 1412.5, 199.5),
+            "current-alert": (12.0, 2.0, 11.5, 2.5),
+            "voltage-alert": (3600.0, 3000.0, 3500.0, 3100.0),
+        }
+        media = []
+        for i in self.vf_ports(fid):
+            if i % 9 == 0:
+                continue
+            item = {
+                "name": f"fc/{self.port_name(i)}",
+                "vendor-name": "BROCADE",
+                "part-number": "57-1000485-01",
+                "serial-number": f"HAA{i:08d}",
+                "temperature": 35 + i % 5,
+                "rx-power": 0.0 if i % 7 == 0 else (40.2 if i % 17 == 0 else 412.7),
+                "tx-power": 520.4,
+                "current": 7.6,
+                "voltage": 3312.4,
+            }
+            for alert, (high_alarm, low_alarm, high_warning, low_warning) in limits.items():
+                item[alert] = {"high-alarm": high_alarm, "low-alarm": low_alarm,
+                               "high-warning": high_warning, "low-warning": low_warning}
+            media.append(item)
+        return {"media-rdp": media}
+
+    def zoning(self, fid):
+        # two members per zone, every port is zoned once
+        ports = list(self.vf_ports(fid))
+        zones = []
+        for n in range(len(ports) // 2 - self.zone_changes):
+            members = [f"10:00:00:00:c9:{p // 256:02x}:{p % 256:02x}:00" for p in ports[2 * n:2 * n + 2]]
+            if n == 0:
+                members += [f"10:00:00:00:c9:ff:{c:02x}:00" for c in range(self.zone_changes)]
+            zones.append({"zone-name": f"zone_{fid}_{n}", "zone-type": 0,
+                          "member-entry": {"entry-name": members}})
+        for c in range(self.zone_changes):
+            zones.append({"zone-name": f"zone_{fid}_new{c}", "zone-type": 0,
+                          "member-entry": {"entry-name": [f"10:00:00:00:c9:fe:{c:02x}:00"]}})
+        return {"effective-configuration": {"cfg-name": "mock_cfg", "checksum": f"{self.zone_changes:032x}",
+                                            "enabled-zone": zones}}
+
+    def name_server(self, fid):
+        # one device per online f-port, the WWPNs are the zone members
+        devices = []
+        for i in self.vf_ports(fid):
+            if i % 8 == 0 or i % 7 == 0:
+                continue
+            devices.append((f"{fid:02x}{i % 256:02x}00", f"10:00:00:00:c9:{i // 256:02x}:{i % 256:02x}:00", i))
+        devices = devices[self.logouts:]
+        devices += [(f"{fid:02x}ff{n:02x}", f"10:00:00:00:c9:fd:{n:02x}:00", None) for n in range(self.logins)]
+        return {"fibrechannel-name-server": [
+            {"port-id": port_id, "port-name": wwpn, "node-name": wwpn.replace("10:", "20:", 1),
+             "port-index": i, "port-symbolic-name": f"host{wwpn[-8:-3].replace(':', '')} HBA port 0",
+             "port-type": "N_Port", "link-speed": "32Gb/s"}
+            for port_id, wwpn, i in devices
+        ]}
+
+    def maps_report(self, fid):
+        # the last virtual fabric has marginal ports
+        fields = ["switch", "power-supply", "fan", "temperature-sensor", "flash", "marginal-port",
+                  "faulty-port", "missing-sfp", "error-port", "wwn", "ha", "blade"]
+        report = {f"{field}-health": "healthy" for field in fields}
+        if fid == self.fids[-1]:
+            report["switch-health"] = "marginal"
+            report["marginal-port-health"] = "marginal"
+        return {"switch-status-policy-report": report}
+
+    def maps_rules(self, fid):
+        # CRC errors on the first ports of the last virtual fabric
+        if fid != self.fids[-1]:
+            return {"dashboard-rule": []}
+        objects = [f"F-Port {self.port_name(i)}" for i in self.vf_ports(fid)[:8]]
+        return {"dashboard-rule": [
+            {"category": "port-health", "name": "defNON_E_F_PORTSCRC_10", "triggered-count": len(objects),
+             "time-stamp": "Sun Oct 18 09:00:00 2026", "repetition-count": 1, "objects": {"object": objects}},
+            {"category": "fabric-state-changes", "name": "defSWITCHFAB_CFG_5", "triggered-count": 1,
+             "time-stamp": "Sun Oct 18 08:00:00 2026", "repetition-count": 1, "objects": {"object": [f"Switch {fid}"]}},
+        ]}
+
+    def blades(self):
+        if not self.director:
+            return {"blade": []}
+        return {"blade": [
+            {"slot-number": 1, "blade-type": "CP", "blade-state": "enabled"},
+            {"slot-number": 2, "blade-type": "CP", "blade-state": "enabled"},
+            {"slot-number": 3, "blade-type": "SW BLADE", "blade-state": "enabled"},
+            {"slot-number": 4, "blade-state": "vacant"},
+        ]}
+
+    def fans(self):
+        return {"fan": [{"unit-number": n, "operational-state": "ok", "speed": 3000 + n} for n in (1, 2, 3)]}
+
+    def power_supplies(self):
+        return {"power-supply": [
+            {"unit-number": n, "operational-state": "ok", "input-voltage": 230,
+             "temperature-sensor-supported": True, "temperature": 30 + n}
+            for n in (1, 2)
+        ]}
+
+    def sensors(self):
+        return {"sensor": [
+            {"id": n, "category": "temperature", "state": "absent" if n == 4 else "ok", "temperature": 35 + n}
+            for n in (1, 2, 3, 4)
+        ]}
+
+    def management_interfaces(self):
+        if not self.director:
+            return {"management-ethernet-interface": [
+                {"cp-name": "cp0", "interface-name": "eth0", "speed": 1000, "duplex": "full",
+                 "connection-established-status": True, "ethernet-status-flags": {"flag": ["up", "running"]}},
+            ]}
+        interfaces = []
+        for cp in ("cp0", "cp1"):
+            interfaces.append({
+                "cp-name": cp, "interface-name": "bond0", "speed": 1000, "duplex": "full",
+                "active-interface": "eth0", "standby-interfaces": {"interface": ["eth3"]},
+                "connection-established-status": True, "ethernet-status-flags": {"flag": ["up", "running"]},
+            })
+            for eth in ("eth0", "eth3"):
+                interfaces.append({
+                    "cp-name": cp, "interface-name": eth, "speed": 1000, "duplex": "full",
+                    "connection-established-status": True, "ethernet-status-flags": {"flag": ["up", "running"]},
+                })
+        return {"management-ethernet-interface": interfaces}
+
+
+class MockFOS(ThreadingMixIn, HTTPServer):
+    """
+    The REST server, can also run in a thread of a benchmark:
+
+        server = MockFOS(("127.0.0.1", 0), Switch(ports=2000, vfs=8), latency=0.05)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+    def __init__(self, address, switch, latency=0.0, token_ttl=0, max_sessions=0,
+                 cert=None, key=None):
+        super().__init__(address, Handler)
+        self.switch = switch
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.max_sessions = max_sessions
+        self.tokens = {}
+        # status of all REST requests, 0 serves them
+        self.unavailable = 0
+        self.lock = threading.Lock()
+        self.reset()
+        if not (cert and key):
+            cert, key = self_signed()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def reset(self):
+        self.stats = {
+            'requests': 0,
+            'logins': 0,
+            'logouts': 0,
+            'rejected_logins': 0,
+            'unauthorized': 0,
+            'endpoints': {},
+        }
+
+    def count(self, name, endpoint=None):
+        with self.lock:
+            self.stats[name] += 1
+            if endpoint:
+                self.stats['endpoints'][endpoint] = self.stats['endpoints'].get(endpoint, 0) + 1
+
+    def login(self):
+        with self.lock:
+            self.expire()
+            if self.max_sessions and len(self.tokens) >= self.max_sessions:
+                self.stats['rejected_logins'] += 1
+                return None
+            token = "Custom_Basic " + uuid.uuid4().hex
+            self.tokens[token] = time.time()
+            self.stats['logins'] += 1
+            return token
+
+    def logout(self, token):
+        with self.lock:
+            if self.tokens.pop(token, None) is not None:
+                self.stats['logouts'] += 1
+
+    def authorized(self, token):
+        with self.lock:
+            self.expire()
+            if token not in self.tokens:
+                self.stats['unauthorized'] += 1
+                return False
+            self.tokens[token] = time.time()
+            return True
+
+    def expire(self):
+        if self.token_ttl:
+            limit = time.time() - self.token_ttl
+            for token in [t for t, used in self.tokens.items() if used < limit]:
+                del self.tokens[token]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, body=None, headers=None, wrap=True):
+        if body is None:
+            data = b""
+        else:
+            data = json.dumps({"Response": body} if wrap else body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", f"application/yang-data+json;version={self.server.switch.api_version}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def error(self, code, message):
+        self.send(code, {"errors": {"error": [{"error-message": message}]}}, wrap=False)
+
+    def do_POST(self):
+        self.server.count('requests')
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        path = urlsplit(self.path).path
+        if self.server.unavailable:
+            return self.error(self.server.unavailable, "Service Unavailable")
+        if path == "/rest/login":
+            token = self.server.login()
+            if token is None:
+                return self.error(403, "Maximum number of REST sessions reached")
+            return self.send(200, None, {"Authorization": token})
+        if path == "/rest/logout":
+            self.server.logout(self.headers.get("Authorization"))
+            return self.send(204)
+        self.error(404, "Not Found")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/stats":
+            with self.server.lock:
+                stats = dict(self.server.stats, sessions=len(self.server.tokens))
+                if 'reset' in query:
+                    self.server.reset()
+            return self.send(200, stats, wrap=False)
+        if url.path == "/zoning":
+            self.server.switch.zone_changes += int(query.get("change", ["1"])[0])
+            return self.send(200, {"changes": self.server.switch.zone_changes}, wrap=False)
+        if url.path == "/nameserver":
+            self.server.switch.logouts += int(query.get("logout", ["0"])[0])
+            self.server.switch.logins += int(query.get("login", ["0"])[0])
+            return self.send(200, {"logouts": self.server.switch.logouts, "logins": self.server.switch.logins},
+                             wrap=False)
+        if url.path == "/unavailable":
+            self.server.unavailable = int(query.get("status", ["503"])[0])
+            return self.send(200, {"status": self.server.unavailable}, wrap=False)
+
+        self.server.count('requests', url.path)
+        if self.server.unavailable:
+            return self.error(self.server.unavailable, "Service Unavailable")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.server.authorized(self.headers.get("Authorization")):
+            return self.error(401, "Invalid or expired token")
+
+        switch = self.server.switch
+        fid = int(query.get("vf-id", [switch.fids[0]])[0])
+        routes = {
+            "brocade-chassis/chassis": switch.chassis,
+            "brocade-chassis/version": switch.version,
+            "brocade-chassis/management-ethernet-interface": switch.management_interfaces,
+            "brocade-fibrechannel-logical-switch/fibrechannel-logical-switch": switch.logical_switches,
+            "brocade-interface/fibrechannel": lambda: switch.fibrechannel(fid),
+            "brocade-interface/fibrechannel-statistics": lambda: switch.statistics(fid),
+            "brocade-media/media-rdp": lambda: switch.media(fid),
+            "brocade-zone/effective-configuration": lambda: switch.zoning(fid),
+            "brocade-name-server/fibrechannel-name-server": lambda: switch.name_server(fid),
+            "brocade-maps/switch-status-policy-report": lambda: switch.maps_report(fid),
+            "brocade-maps/dashboard-rule": lambda: switch.maps_rules(fid),
+            "brocade-fru/blade": switch.blades,
+            "brocade-fru/fan": switch.fans,
+            "brocade-fru/power-supply": switch.power_supplies,
+            "brocade-fru/sensor": switch.sensors,
+            "brocade-fru/wwn": lambda: {"wwn": []},
+            "brocade-fru/history-log": lambda: {"history-log": []},
+        }
+        route = routes.get(url.path.replace("/rest/running/", "", 1).rstrip("/"))
+        if route is None:
+            return self.error(404, "Not Found")
+        self.send(200, route())
+
+
+def self_signed():
+    """ certificate and key for localhost in a temporary directory """
+    directory = tempfile.mkdtemp(prefix="mockfos")
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+                    "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def start(switch, **options):
+    """ MockFOS on a free port of 127.0.0.1 served by a thread """
+    server = MockFOS(("127.0.0.1", 0), switch, **options)
+    threading.Thread(target=server.serve_forever, name="mockfos", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stand-in FOS REST server")
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--ports", type=int, default=48, help="fibrechannel ports, 24 to 2000")
+    parser.add_argument("--vfs", type=int, default=1, help="virtual fabrics, 1 to 16")
+    parser.add_argument("--switch", action="store_true", help="fixed port switch instead of a director")
+    parser.add_argument("--api-version", default="1.60.0", choices=API_VERSIONS)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per GET request")
+    parser.add_argument("--token-ttl", type=int, default=0, help="idle seconds until a token expires")
+    parser.add_argument("--max-sessions", type=int, default=0, help="concurrent sessions, 0 is unlimited")
+    parser.add_argument("--cert")
+    parser.add_argument("--key")
+    args = parser.parse_args()
+    if not 24 <= args.ports <= 2000:
+        parser.error("--ports must be between 24 and 2000")
+    if not 1 <= args.vfs <= 16:
+        parser.error("--vfs must be between 1 and 16")
+
+    switch = Switch(args.ports, args.vfs, not args.switch, args.api_version)
+    server = MockFOS((args.listen, args.port), switch, latency=args.latency, token_ttl=args.token_ttl,
+                     max_sessions=args.max_sessions, cert=args.cert, key=args.key)
+    print(f"mockfos on https://{args.listen}:{args.port} with {args.ports} ports in {args.vfs} VF")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
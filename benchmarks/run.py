@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+End-to-end benchmark of the checks against benchmarks/mockfos.py.
+
+    benchmarks/run.py                                   # all checks, 48 ports, 1 VF
+    benchmarks/run.py --ports 2000 --vfs 8 --latency 0.05 -n 10
+    benchmarks/run.py --check interface-health --options "--port-type all"
+    benchmarks/run.py --extra "-s /tmp/bench.session"   # options for every check
+    benchmarks/run.py --stress 200 --max-sessions 8     # 200 concurrent invocations
+
+Every check runs as its own process like naemon starts it. Reported per
+check: wall time (median / max), REST requests and logins per run seen by
+the mock and the peak RSS of the check process. The stress mode starts all
+invocations of one check at once to show login storms and session limits.
+"""
+
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import mockfos
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKS = ["about", "hardware-health", "interface-health", "mgmt-interface-health", "port-errors",
+          "port-utilization", "media-health", "zone-config",
+          "nameserver", "maps-health"]
+STATUS = {0: "OK", 1: "WARNING", 2: "CRITICAL", 3: "UNKNOWN"}
+
+
+def invoke(argv, env):
+    """ run a check, returns (seconds, exit code, peak RSS in kB, first output line) """
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 3
+    process.stdout.close()
+    elapsed = time.perf_counter() - start
+    line = output.decode(errors="replace").split("\n", 1)[0]
+    # ru_maxrss is in kB on Linux
+    return (elapsed, process.returncode, usage.ru_maxrss, line)
+
+
+def stats(server):
+    with server.lock:
+        return dict(server.stats, sessions=len(server.tokens))
+
+
+def check_argv(check, port, options):
+    return ([sys.executable, "-m", "checkbrocade.cli", check, "-H", "127.0.0.1", "-P", str(port),
+             "-u", "admin", "-p", "password"] + options)
+
+
+def environment():
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # the self signed certificate of the mock is not verified, a CA bundle would override that
+    env.pop("REQUESTS_CA_BUNDLE", None)
+    env.pop("CURL_CA_BUNDLE", None)
+    return env
+
+
+def benchmark(server, checks, runs, options):
+    env = environment()
+    port = server.server_address[1]
+    print(f"{'check':24} {'median ms':>10} {'max ms':>8} {'requests':>9} {'logins':>7} {'RSS MB':>7}  status")
+    for check in checks:
+        before = stats(server)
+        results = [invoke(check_argv(check, port, options), env) for _ in range(runs)]
+        after = stats(server)
+        times = [r[0] * 1000 for r in results]
+        codes = Counter(STATUS.get(r[1], str(r[1])) for r in results)
+        print(f"{check:24} {statistics.median(times):10.1f} {max(times):8.1f}"
+              f" {(after['requests'] - before['requests']) / runs:9.1f}"
+              f" {(after['logins'] - before['logins']) / runs:7.1f}"
+              f" {max(r[2] for r in results) / 1024:7.1f}  {dict(codes)}")
+        if codes.get("UNKNOWN"):
+            print(f"  {next(r[3] for r in results if r[1] == 3)}")
+
+
+def stress(server, check, count, options):
+    env = environment()
+    port = server.server_address[1]
+    argv = check_argv(check, port, options)
+    before = stats(server)
+    barrier = threading.Barrier(count)
+
+    def one():
+        barrier.wait()
+        return invoke(argv, env)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        results = list(executor.map(lambda _: one(), range(count)))
+    wall = time.perf_counter() - start
+    after = stats(server)
+
+    times = sorted(r[0] * 1000 for r in results)
+    codes = Counter(STATUS.get(r[1], str(r[1])) for r in results)
+    print(f"{count} concurrent {check} in {wall:.2f}s")
+    print(f"  latency ms      median {statistics.median(times):.0f} / p95 {times[int(len(times) * 0.95) - 1]:.0f}"
+          f" / max {times[-1]:.0f}")
+    print(f"  requests        {after['requests'] - before['requests']}")
+    print(f"  logins          {after['logins'] - before['logins']}"
+          f" ({after['rejected_logins'] - before['rejected_logins']} rejected)")
+    print(f"  401 responses   {after['unauthorized'] - before['unauthorized']}")
+    print(f"  open sessions   {after['sessions']}")
+    print(f"  peak RSS MB     {max(r[2] for r in results) / 1024:.1f}")
+    print(f"  results         {dict(codes)}")
+    failed = Counter(r[3] for r in results if r[1] == 3)
+    for line, n in failed.most_common(3):
+        print(f"  {n:4}x {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="end-to-end benchmark of the checks against mockfos")
+    parser.add_argument("--check", action="append", help=f"check to run, default all: {' '.join(CHECKS)}")
+    parser.add_argument("--options", default="", help="options of the check(s)")
+    parser.add_argument("--extra", default="", help="standard options for every check, e.g. \"-s FILE\"")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--stress", type=int, metavar="N", help="start N invocations at once")
+    parser.add_argument("--ports", type=int, default=48)
+    parser.add_argument("--vfs", type=int, default=1)
+    parser.add_argument("--switch", action="store_true", help="fixed port switch instead of a director")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=int, default=0)
+    parser.add_argument("--max-sessions", type=int, default=0)
+    args = parser.parse_args()
+
+    switch = mockfos.Switch(args.ports, args.vfs, not args.switch)
+    server = mockfos.start(switch, latency=args.latency, token_ttl=args.token_ttl,
+                           max_sessions=args.max_sessions)
+    print(f"mockfos with {args.ports} ports in {args.vfs} VF, latency {args.latency}s,"
+          f" token ttl {args.token_ttl or '-'}, max sessions {args.max_sessions or '-'}")
+    options = shlex.split(args.extra) + shlex.split(args.options)
+    try:
+        if args.stress:
+            stress(server, (args.check or ["interface-health"])[0], args.stress, options)
+        else:
+            benchmark(server, args.check or CHECKS, args.runs, options)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
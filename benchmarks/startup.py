@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Startup time of check_brocade, what naemon pays for every fork.
+
+    benchmarks/startup.py                       # python -m checkbrocade.cli about --help
+    benchmarks/startup.py --zipapp ./check_brocade
+    benchmarks/startup.py -n 50 -- interface-health --help
+
+Reports min / median / max wall time in ms and whether requests was imported.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def command(args):
+    if args.zipapp:
+        return [sys.executable, args.zipapp]
+    return [sys.executable, "-m", "checkbrocade.cli"]
+
+
+def measure(cmd, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def imports_requests(cmd):
+    """ run the command with -X importtime and look for requests """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([cmd[0], "-X", "importtime"] + cmd[1:], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    return any(line.rstrip().endswith("| requests") for line in result.stderr.splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="startup time of check_brocade")
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    parser.add_argument("--zipapp", help="measure the zipapp built by make instead of the source tree")
+    parser.add_argument("--target", type=float, default=50.0, help="target median in ms, default 50")
+    parser.add_argument("argv", nargs="*", default=["about", "--help"])
+    args = parser.parse_args()
+
+    cmd = command(args) + args.argv
+    baseline = measure([sys.executable, "-c", "pass"], args.runs)
+    times = measure(cmd, args.runs)
+    median = statistics.median(times)
+    print(f"command:     {' '.join(cmd)}")
+    print(f"interpreter: {statistics.median(baseline):.1f} ms median for python -c pass")
+    print(f"startup:     min {min(times):.1f} / median {median:.1f} / max {max(times):.1f} ms of {args.runs} runs")
+    print(f"requests:    {'imported' if imports_requests(cmd) else 'not imported'}")
+    if median > args.target:
+        print(f"median is over the target of {args.target:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
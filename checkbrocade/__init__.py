@@ -22,4 +22,12 @@ class CheckBrocadeTimeout(BaseException):
     pass
 
 class CheckBrocadeConnnectException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class CheckBrocadeDeadline(CheckBrocadeException):
+    """ the time budget of the run is used up, the request was not done """
+    pass
+
+class CheckBrocadeCircuitOpen(CheckBrocadeConnnectException):
+    """ requests to the switch fail fast, see tools.breaker """
+    pass
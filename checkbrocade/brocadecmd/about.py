@@ -19,8 +19,9 @@
 import logging
 from monplugin import Check,Status
 from ..tools import cli
-from ..tools.helper import severity, compare_versions, convert_keys
-from ..tools.connect import broadcomAPI
+from ..tools.helper import severity, convert_keys
+from ..tools.timing import api_perfdata
+from ..tools.plan import Endpoint, fos_min, show_plan
 from pprint import pprint as pp
 
 __cmd__ = "about"
@@ -30,13 +31,22 @@ description = f"{__cmd__} need just connection settings and show up the brocade
 logger = None
 args = None
 
-def run():
-    global logger
-    global args
+ENDPOINTS = [
+    Endpoint('chassis', "rest/running/brocade-chassis/chassis"),
+    # FOS < 9.2.0 has no version endpoint, the version follows from the API version
+    Endpoint('version', "rest/running/brocade-chassis/version", when=fos_min("9.2.0")),
+]
+
+def get_parser():
     parser = cli.Parser()
     parser.set_epilog("Connect to brocade API and check Software version")
     parser.set_description(description)
-    args = parser.get_args()
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
 
     # Setup module logging
     logger = logging.getLogger(__name__)
@@ -54,14 +64,16 @@ def run():
         check.exit(Status.UNKNOWN, f"{e}")
 
 def plugin(check):
-    base_url = f"https://{args.host}:{args.port}"
-    api = broadcomAPI(logger, base_url, args.username, args.password, args.sessionfile)
-    response = api.make_request("GET", "rest/running/brocade-chassis/chassis")
-    chass = convert_keys(response)
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+    response = plan.fetch()
+    chass = convert_keys(response['chassis'])
     chassis = chass.chassis
-    if compare_versions("9.2.0", api.version(True)):
-        response = api.make_request("GET", "rest/running/brocade-chassis/version")
-        ns = convert_keys(response)
+    if 'version' in response:
+        ns = convert_keys(response['version'])
         version = ns.version.fabric_os
     else:
         logger.info("FOS < 9.2.0 use version from API response")
@@ -69,6 +81,7 @@ def plugin(check):
 
     check.add_message(Status.OK, f"{chassis.manufacturer} {chassis.product_name} FOS {version} S/N {chassis.vendor_serial_number}")
     (code, message) = check.check_messages(separator="\n")
+    api_perfdata(check, api, args)
     check.exit(code=code,message=message)
 
 if __name__ == "__main__":
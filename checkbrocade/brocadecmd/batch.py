@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import argparse
+import json
+import logging
+import shlex
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from monplugin import Check,Status
+from checkbrocade import CheckBrocadeTimeout
+from ..tools import cli
+from ..tools.helper import severity
+from ..tools import passive
+from ..tools.inventory import read_inventory
+from ..tools.runner import CheckResult, iter_checks
+
+__cmd__ = "batch"
+description = f"{__cmd__} runs the checks of all switches of an inventory concurrently"
+"""
+"""
+logger = None
+args = None
+
+DEFAULT_CHECKS = ["about", "hardware-health", "interface-health", "mgmt-interface-health"]
+
+def get_parser():
+    parser = cli.Parser(connection=False)
+    parser.set_epilog("Run the checks of all switches in the inventory with a pool of worker processes.\n"
+                      "Every switch gets one session for all its checks and a deadline, so a slow\n"
+                      "or failing switch does not block the others.")
+    parser.set_description(description)
+    parser.add_required_arguments({
+        'name_or_flags': ['--inventory'],
+        'options': {
+            'action': 'store',
+            'help': 'inventory file, see checkbrocade/tools/inventory.py',
+        }})
+    parser.add_optional_arguments({
+        'name_or_flags': ['--workers'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 8,
+            'help': 'number of switches checked at the same time, default is 8',
+        }},
+        {'name_or_flags': ['--deadline'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 50,
+            'help': 'seconds for all checks of one switch, default is 50',
+        }},
+        {'name_or_flags': ['--output'],
+        'options': {
+            'action': 'store',
+            'choices': ['json', 'passive'],
+            'default': 'json',
+            'help': 'json lines or passive check results, default is json',
+        }},
+        {'name_or_flags': ['--command-file'],
+        'options': {
+            'action': 'store',
+            'help': 'submit passive results to the naemon.cmd / nagios.cmd pipe',
+        }},
+        {'name_or_flags': ['--checkresult-dir'],
+        'options': {
+            'action': 'store',
+            'help': 'submit passive results as files to the checkresult spool directory',
+        },
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    # every switch has its own deadline instead of the plugin timeout
+    signal.alarm(0)
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def deadline_handler(signum, frame):
+    raise CheckBrocadeTimeout("Deadline reached")
+
+def check_host(entry, options):
+    """
+    Runs in a worker process: all checks of one switch with one session.
+    Returns (name, [(check, code, message, perfdata, duration)])
+    """
+    host_args = argparse.Namespace(**vars(options))
+    host_args.host = entry['host']
+    host_args.port = entry['port']
+    host_args.username = entry['username']
+    host_args.password = entry['password']
+    host_args.sessionfile = None
+
+    results = []
+    start = time.time()
+    signal.signal(signal.SIGALRM, deadline_handler)
+    signal.alarm(options.deadline)
+    cli.set_deadline(options.deadline)
+    try:
+        for name, result in iter_checks(host_args, entry['checks']):
+            results.append((name, result.code.value, result.message, result.perfdata, time.time() - start))
+    except CheckBrocadeTimeout:
+        for spec in entry['checks'][len(results):]:
+            name = shlex.split(spec)[0]
+            results.append((name, Status.UNKNOWN.value, f"deadline of {options.deadline}s reached",
+                            "", time.time() - start))
+    finally:
+        signal.alarm(0)
+    return (entry['name'], results)
+
+def plugin(check):
+    inventory = read_inventory(args.inventory, DEFAULT_CHECKS)
+    hosts = {entry['name']: entry for entry in inventory}
+    logger.info(f"checking {len(hosts)} switches with {args.workers} workers")
+
+    # the worker processes do not need the inventory credentials of other switches
+    options = argparse.Namespace(**{k: v for k, v in vars(args).items() if k != 'inventory'})
+
+    count = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(check_host, entry, options): name for name, entry in hosts.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                name, results = future.result()
+            except Exception as e:
+                logger.error(f"{name} failed: {e}")
+                failed.append(name)
+                results = [(shlex.split(spec)[0], Status.UNKNOWN.value, f"{e}", "", 0.0)
+                           for spec in hosts[name]['checks']]
+            emit(hosts[name], results)
+            count += len(results)
+            if any(r[1] == Status.UNKNOWN.value for r in results):
+                failed.append(name)
+
+    summary = f"{count} results of {len(hosts)} switches"
+    if failed:
+        check.exit(Status.WARNING, f"{summary}, UNKNOWN results for {' '.join(sorted(set(failed)))}")
+    check.exit(Status.OK, summary)
+
+def emit(entry, results):
+    finish = time.time()
+    lines = []
+    for name, code, message, perfdata, duration in results:
+        result = CheckResult(Status(code), message, perfdata)
+        service = entry['services'].get(name, name)
+        if args.output == 'json':
+            lines.append(json.dumps({
+                'host_name': entry['name'],
+                'service': service,
+                'state': code,
+                'output': result.output(),
+                'duration': round(duration, 3),
+            }) + "\n")
+        elif args.checkresult_dir:
+            passive.write_checkresult(args.checkresult_dir, entry['name'], service, result,
+                                      finish - duration, finish)
+        else:
+            lines.append(passive.command_line(entry['name'], service, result, finish))
+
+    if args.output == 'passive' and args.command_file:
+        passive.submit_command_file(args.command_file, lines)
+    else:
+        sys.stdout.writelines(lines)
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+import sys
+import time
+from monplugin import Check,Status
+from ..tools import cli
+from ..tools.helper import severity
+from ..tools import passive
+from ..tools.runner import run_checks
+
+__cmd__ = "bundle"
+description = f"{__cmd__} runs several checks with one session and submits them as passive results"
+"""
+"""
+logger = None
+args = None
+
+DEFAULT_CHECKS = ["about", "hardware-health", "interface-health", "mgmt-interface-health"]
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Run several checks in one process and submit each result as passive service check result.\n"
+                      "Without --command-file or --checkresult-dir the external commands are printed.\n"
+                      "Example: --check about --check 'interface-health --port-type all' --service about='Brocade About'")
+    parser.set_description(description)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--check'],
+        'options': {
+            'action': 'append',
+            'help': 'check with its options, can be used multiple times.\n'
+                    f"default is {' '.join(DEFAULT_CHECKS)}",
+        }},
+        {'name_or_flags': ['--host-name'],
+        'options': {
+            'action': 'store',
+            'help': 'host_name of the passive results, default is --host',
+        }},
+        {'name_or_flags': ['--service'],
+        'options': {
+            'action': 'append',
+            'help': 'service_description of a check as CHECK=DESCRIPTION, default is the check name',
+        }},
+        {'name_or_flags': ['--command-file'],
+        'options': {
+            'action': 'store',
+            'help': 'submit results to the naemon.cmd / nagios.cmd pipe',
+        }},
+        {'name_or_flags': ['--checkresult-dir'],
+        'options': {
+            'action': 'store',
+            'help': 'submit results as files to the checkresult spool directory',
+        },
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def plugin(check):
+    host_name = args.host_name or args.host
+    services = {}
+    for s in args.service or []:
+        name, description = s.split("=", 1)
+        services[name] = description
+
+    start = time.time()
+    results = run_checks(args, args.check or DEFAULT_CHECKS)
+    finish = time.time()
+
+    lines = []
+    for name, result in results:
+        service = services.get(name, name)
+        logger.info(f"{service} is {result.code.name}")
+        if args.checkresult_dir:
+            path = passive.write_checkresult(args.checkresult_dir, host_name, service, result, start, finish)
+            logger.debug(f"wrote {path}")
+        else:
+            lines.append(passive.command_line(host_name, service, result, finish))
+        check.add_message(Status.OK, f"{service} {result.code.name}")
+
+    if args.command_file:
+        passive.submit_command_file(args.command_file, lines)
+    elif lines:
+        sys.stdout.writelines(lines)
+
+    (code, message) = check.check_messages(separator=", ")
+    check.exit(code=code,message=f"submitted {len(results)} results: {message}")
+
+if __name__ == "__main__":
+    run()
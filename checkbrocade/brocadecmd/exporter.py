@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import argparse
+import logging
+import signal
+from monplugin import Check,Status
+from ..tools import cli
+from ..tools.helper import severity
+from ..tools.inventory import read_inventory
+from ..tools.exporter import Exporter
+
+__cmd__ = "exporter"
+description = f"{__cmd__} serves metrics of the switches of an inventory for Prometheus"
+"""
+"""
+logger = None
+args = None
+
+def get_parser():
+    parser = cli.Parser(connection=False)
+    parser.set_epilog("Polls chassis, FRUs, ports and port statistics of all switches in the inventory\n"
+                      "in the background, every switch with one session, and serves the latest\n"
+                      "metrics at /metrics. A scrape is answered from memory and does not wait\n"
+                      "for any switch.")
+    parser.set_description(description)
+    parser.add_required_arguments({
+        'name_or_flags': ['--inventory'],
+        'options': {
+            'action': 'store',
+            'help': 'inventory file, see checkbrocade/tools/inventory.py',
+        }})
+    parser.add_optional_arguments({
+        'name_or_flags': ['--listen'],
+        'options': {
+            'action': 'store',
+            'default': ':9711',
+            'help': 'address and port of /metrics, default is :9711',
+        }},
+        {'name_or_flags': ['--interval'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 60,
+            'help': 'seconds between the polls of a switch, default is 60',
+        }},
+        {'name_or_flags': ['--jitter'],
+        'options': {
+            'action': 'store',
+            'type': float,
+            'default': 0.1,
+            'help': 'random part of the interval, default is 0.1 (+-10%%)',
+        }},
+        {'name_or_flags': ['--poll-timeout'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 30,
+            'help': 'seconds for all requests of one poll, default is 30',
+        }},
+        {'name_or_flags': ['--concurrency'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 16,
+            'help': 'switches polled at the same time, default is 16',
+        },
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        logger.disabled = False
+        logger.setLevel(severity(args.verbose))
+
+    # the exporter runs until it is stopped, every poll has its own deadline
+    signal.alarm(0)
+    signal.signal(signal.SIGTERM, stop_handler)
+
+    check = Check()
+    try:
+        plugin(check)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+    check.exit(Status.OK, "exporter stopped")
+
+def stop_handler(signum, frame):
+    raise KeyboardInterrupt()
+
+def plugin(check):
+    inventory = read_inventory(args.inventory)
+    # the pollers do not need the inventory
+    options = argparse.Namespace(**{k: v for k, v in vars(args).items() if k != 'inventory'})
+    exporter = Exporter(logger, inventory, options)
+    exporter.serve(args.listen)
+
+if __name__ == "__main__":
+    run()
@@ -19,8 +19,9 @@
 import logging
 from monplugin import Check,Status,Threshold
 from ..tools import cli
-from ..tools.helper import severity,compare_versions,convert_keys,seconds_to_human
-from ..tools.connect import broadcomAPI
+from ..tools.helper import severity,convert_keys,seconds_to_human,partial_result
+from ..tools.timing import api_perfdata
+from ..tools.plan import Endpoint, fos_min, show_plan
 
 __cmd__ = "hardware-health"
 description = f"{__cmd__} checks for hardware health state of Blade, Fan, Temperature and Power-Supplies"
@@ -28,9 +29,16 @@ description = f"{__cmd__} checks for hardware health state of Blade, Fan, Temper
 """
 logger = None
 args = None
-def run():
-    global logger
-    global args
+
+ENDPOINTS = [
+    Endpoint('blade', "rest/running/brocade-fru/blade"),
+    Endpoint('fan', "rest/running/brocade-fru/fan"),
+    Endpoint('power', "rest/running/brocade-fru/power-supply"),
+    # older FOS has no usable sensor endpoint
+    Endpoint('temp', "rest/running/brocade-fru/sensor", when=fos_min("9.0.0")),
+    Endpoint('uptime', "rest/running/brocade-chassis/chassis"),
+]
+def get_parser():
     parser = cli.Parser()
     parser.set_epilog("Check for health of Blade, Fan, Temperature and Powersupplies")
     parser.set_description(description)
@@ -53,7 +61,12 @@ def run():
             'help': 'Critical until system uptime ge seconds',
         },
     })
-    args = parser.get_args()
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
 
     # Setup module logging
     logger = logging.getLogger(__name__)
@@ -71,24 +84,29 @@ def run():
         check.exit(Status.UNKNOWN, f"{e}")
 
 def plugin(check):
-    base_url = f"https://{args.host}:{args.port}"
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
     if not hasattr(args, 'type') or not args.type:
         sType = ['blade','fan','power','temp']
     else:
         sType = args.type
 
     logger.debug(f"begin {__cmd__}")
-    api = broadcomAPI(logger, base_url, args.username, args.password, args.sessionfile)
+    api = api_from_args(logger, args)
 
     logger.debug(f"Resource API version: {api.version()} might be FabricOS {api.version(True)}")
-    if not compare_versions("9.0.0", api.version(True)):
-        logger.warning(f"as version {api.version(True)} is to old I remove sensor endpoint")
-        sType.remove("temp")
-
+    # the chassis is just needed for the uptime thresholds
     if args.uptime_warn or args.uptime_crit:
+        sType = sType + ['uptime']
+    plan = api.plan([e for e in ENDPOINTS if e.name in sType])
+    show_plan(check, plan, args)
+    # evaluate what was fetched before the deadline
+    response = plan.fetch(return_exceptions=True)
+    sType = [t for t in sType if t in response]
+
+    if 'uptime' in response:
         uptime = Threshold(args.uptime_warn or None, args.uptime_crit or None)
-        response = api.make_request("GET","rest/running/brocade-chassis/chassis")
-        c = convert_keys(response)
+        c = convert_keys(response['uptime'])
         chassis = c.chassis
         logger.info(f"uptime is {chassis.system_uptime} or {seconds_to_human(chassis.system_uptime)}")
         uptime_status = uptime.get_status(chassis.system_uptime)
@@ -99,7 +117,7 @@ def plugin(check):
 
     if 'blade' in sType:
         blade_count = 0
-        b = api.make_request("GET", "rest/running/brocade-fru/blade")
+        b = response['blade']
         for blade in b['blade']:
             if 'blade-type' in blade:
                 blade_count += 1
@@ -115,18 +133,8 @@ def plugin(check):
                 check.add_message(Status.CRITICAL, text)
         summary += f"{blade_count}/{len(b['blade'])} Blades "
 
-    # no usabel respones for wwn query
-    if 'wwn' in sType:
-        pass
-        w = api.make_request("GET", "rest/running/brocade-fru/wwn")
-
-    # also no sensfull data at this time
-    if 'history' in sType:
-        pass
-        h = api.make_request("GET", "rest/running/brocade-fru/history-log")
-
     if 'fan' in sType:
-        f = api.make_request("GET", "rest/running/brocade-fru/fan")
+        f = response['fan']
         if not f:
             check.add_message(Status.OK, "no fan")
         else:
@@ -142,7 +150,7 @@ def plugin(check):
             summary += f"{len(f['fan'])} Fans "
 
     if 'power' in sType:
-        p = api.make_request("GET", "rest/running/brocade-fru/power-supply")
+        p = response['power']
         if not p:
             check.add_message(Status.OK, "no powersupply")
         else:
@@ -162,7 +170,7 @@ def plugin(check):
             summary += f"{len(p['power-supply'])} power-supplies "
 
     if 'temp' in sType:
-        t = api.make_request("GET", "rest/running/brocade-fru/sensor")
+        t = response['temp']
         if not t:
             check.add_messages(Status.OK, "no temp")
         else:
@@ -184,9 +192,10 @@ def plugin(check):
 
     (code, message) = check.check_messages(separator="\n")
     if code == Status.OK:
-        check.exit(code=code,message=f"{summary}\n{message}")
-    else:
-        check.exit(code=code,message=message)
+        message = f"{summary}\n{message}"
+    (code, message) = partial_result(code, message, plan.skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+import re
+from monplugin import Check,Status
+from checkbrocade import CheckBrocadeException
+from ..tools import cli
+from ..tools.helper import severity, partial_result
+from ..tools.timing import api_perfdata
+from ..tools.filter import compile_filter
+from ..tools.plan import Endpoint, show_plan
+
+__cmd__ = "maps-health"
+description = f"{__cmd__} switch status and rule violations evaluated by MAPS"
+"""
+"""
+logger = None
+args = None
+
+ENDPOINTS = [
+    # MAPS runs per logical switch
+    Endpoint('report', "rest/running/brocade-maps/switch-status-policy-report", per_vf=True),
+    Endpoint('rules', "rest/running/brocade-maps/dashboard-rule", per_vf=True),
+]
+
+# category of the switch status policy report, the rules have their own
+SWITCH_STATUS = "switch-status"
+
+# values of the switch status policy report
+POLICY_STATES = {
+    'healthy': Status.OK,
+    'marginal': Status.WARNING,
+    'down': Status.CRITICAL,
+}
+
+# state of triggered rules by category, the others are a warning
+CATEGORY_STATES = {
+    'fru-health': Status.CRITICAL,
+    'security-health': Status.CRITICAL,
+    'security-violations': Status.CRITICAL,
+}
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Reads the switch status policy report and the rules triggered in the MAPS\n"
+                      "dashboard, MAPS on the switch does the evaluation. Report values are OK\n"
+                      "(healthy), WARNING (marginal) or CRITICAL (down). Triggered rules are a\n"
+                      "warning, of fru-health and security categories critical, see --category-state.\n"
+                      f"With just --category {SWITCH_STATUS} the dashboard is not requested.")
+    parser.set_description(description)
+    parser.add_optional_arguments(cli.Argument.EXCLUDE,
+                                  cli.Argument.INCLUDE,
+                                  cli.Argument.FILTER)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--category'],
+        'options': {
+            'action': 'store',
+            'default': ['all'],
+            'nargs': '+',
+            'help': f"list of categories to check, e.g. {SWITCH_STATUS} port-health fru-health,\n"
+                    "default is all",
+        }},
+        {
+        'name_or_flags': ['--category-state'],
+        'options': {
+            'action': 'store',
+            'nargs': '+',
+            'help': 'CATEGORY=STATE state of triggered rules of CATEGORY, STATE is ok,\n'
+                    'warning or critical, e.g. fabric-state-changes=ok',
+        }
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def category_name(category):
+    """ Port Health and port-health -> port-health """
+    return re.sub(r'[^a-z0-9]+', '-', str(category).lower()).strip('-')
+
+def parse_category_states(states):
+    """ ['port-health=critical'] -> CATEGORY_STATES with port-health CRITICAL """
+    parsed = dict(CATEGORY_STATES)
+    for state in states or []:
+        category, _, name = state.partition("=")
+        if not category or name.upper() not in ('OK', 'WARNING', 'CRITICAL'):
+            raise CheckBrocadeException(f"invalid category state {state}, use CATEGORY=ok|warning|critical")
+        parsed[category_name(category)] = Status[name.upper()]
+    return parsed
+
+def plugin(check):
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    category_states = parse_category_states(args.category_state)
+    maps_filter = compile_filter(args, args.category, text_fields=('type', 'name'))
+
+    # the dashboard is not needed for the switch status alone
+    endpoints = ENDPOINTS
+    if all(c.lower().startswith(SWITCH_STATUS) for c in args.category):
+        endpoints = [e for e in ENDPOINTS if e.name != 'rules']
+
+    api = api_from_args(logger, args)
+    plan = api.plan(endpoints)
+    show_plan(check, plan, args)
+    response = plan.fetch(return_exceptions=True)
+
+    counts = {'rules': 0, 'violations': 0}
+    switches = 0
+    # logical switches with a policy report value that is not healthy
+    unhealthy = set()
+    for vf,report in response['report'].items():
+        VF = "" if vf == 'novf' else f"VF {vf:3} "
+        vf = '' if vf == 'novf' else vf
+        switches += 1
+        for field, value in report['switch-status-policy-report'].items():
+            item = {'type': SWITCH_STATUS, 'name': re.sub(r'-health$', '', field), 'state': value, 'vf': vf}
+            if not maps_filter(item):
+                continue
+            status = POLICY_STATES.get(str(value).lower())
+            if status is None:
+                logger.info(f"{VF}{field} {value} not evaluated")
+                continue
+            if status != Status.OK:
+                unhealthy.add(vf)
+                check.add_message(status, f"{VF}{item['name']} {value}")
+
+    for vf,dashboard in response.get('rules', {}).items():
+        VF = "" if vf == 'novf' else f"VF {vf:3} "
+        vf = '' if vf == 'novf' else vf
+        for rule in dashboard.get('dashboard-rule') or []:
+            category = category_name(rule.get('category', ''))
+            item = {'type': category, 'name': rule.get('name', ''), 'vf': vf}
+            if not maps_filter(item):
+                continue
+            triggered = rule.get('triggered-count', 1)
+            counts['rules'] += 1
+            counts['violations'] += triggered
+            objects = (rule.get('objects') or {}).get('object') or []
+            text = f"{VF}{category} {item['name']} triggered {triggered} times, last {rule.get('time-stamp', '')}"
+            if objects:
+                text += f": {', '.join(objects[:5])}" + (f" and {len(objects) - 5} more" if len(objects) > 5 else "")
+            status = category_states.get(category, Status.WARNING)
+            if status == Status.OK:
+                logger.info(text)
+            else:
+                check.add_message(status, text)
+
+    check.add_perfdata(label="unhealthy", value=len(unhealthy))
+    if 'rules' in response:
+        check.add_perfdata(label="rules", value=counts['rules'])
+        check.add_perfdata(label="violations", value=counts['violations'])
+
+    (code, message) = check.check_messages(separator="\n", separator_all="\n", allok=" ")
+    summary = f"MAPS of {switches} switches, {len(unhealthy)} unhealthy"
+    if 'rules' in response:
+        summary += f", {counts['rules']} rules triggered"
+    message = f"{summary}\n{message}" if code != Status.OK else summary
+    (code, message) = partial_result(code, message, plan.skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+import math
+import operator
+from monplugin import Check,Status,Threshold
+from checkbrocade import CheckBrocadeException
+from ..tools import cli
+from ..tools.helper import severity, partial_result
+from ..tools.timing import api_perfdata
+from ..tools.filter import compile_filter
+from ..tools.classify import classifier_for, is_director
+from ..tools.plan import Endpoint, show_plan
+
+__cmd__ = "media-health"
+description = f"{__cmd__} temperature, power, current and voltage of the SFPs"
+"""
+"""
+logger = None
+args = None
+
+ENDPOINTS = [
+    Endpoint('chassis', "rest/running/brocade-chassis/chassis"),
+    # state of the ports, the laser of ports without light is not checked
+    Endpoint('fibrechannel', "rest/running/brocade-interface/fibrechannel", per_vf=True),
+    Endpoint('media', "rest/running/brocade-media/media-rdp", per_vf=True),
+]
+
+# values of media-rdp with their unit, the vendor limits are in <metric>-alert
+METRICS = {
+    'temperature': "C",
+    'rx-power': "uW",
+    'tx-power': "uW",
+    'current': "mA",
+    'voltage': "mV",
+}
+
+# metrics of the laser, below the low alarm on ports that are not online
+# (disabled, offline, no light) and not checked there
+LASER_METRICS = ('rx-power', 'tx-power', 'current')
+
+# vendor limits in the order they are checked
+LIMITS = (
+    ('high-alarm', Status.CRITICAL, operator.gt, "above"),
+    ('low-alarm', Status.CRITICAL, operator.lt, "below"),
+    ('high-warning', Status.WARNING, operator.gt, "above"),
+    ('low-warning', Status.WARNING, operator.lt, "below"),
+)
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Checks temperature, rx-power, tx-power, current and voltage of every SFP against\n"
+                      "the alarm and warning limits of its vendor, or the thresholds given with\n"
+                      "--threshold. rx-power, tx-power and current of ports that are not online\n"
+                      "(disabled or offline, the laser is off) or of unknown state are not checked.")
+    parser.set_description(description)
+    parser.add_optional_arguments(cli.Argument.EXCLUDE,
+                                  cli.Argument.INCLUDE,
+                                  cli.Argument.FILTER)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--threshold'],
+        'options': {
+            'action': 'store',
+            'nargs': '+',
+            'help': 'METRIC=WARNING,CRITICAL replaces the vendor limits of METRIC,\n'
+                    'ranges like -w/-c, e.g. temperature=60,70 rx-power=100:,50:\n'
+                    f"metrics: {' '.join(METRICS)}",
+        }
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def parse_thresholds(thresholds):
+    """ ['temperature=60,70'] -> {'temperature': Threshold('60', '70')} """
+    parsed = {}
+    for threshold in thresholds or []:
+        metric, _, ranges = threshold.partition("=")
+        if metric not in METRICS or not ranges:
+            raise CheckBrocadeException(f"invalid threshold {threshold}, use METRIC=WARNING,CRITICAL "
+                                        f"with METRIC one of {', '.join(METRICS)}")
+        warning, _, critical = ranges.partition(",")
+        parsed[metric] = Threshold(warning or None, critical or None)
+    return parsed
+
+def compile_checks(thresholds):
+    """
+    one function per metric, media item -> (status, text), built once
+    and applied to every SFP
+    """
+    checks = []
+    for metric, uom in METRICS.items():
+        if metric in thresholds:
+            checks.append((metric, threshold_check(metric, uom, thresholds[metric])))
+        else:
+            checks.append((metric, vendor_check(metric, uom)))
+    return checks
+
+def threshold_check(metric, uom, threshold):
+    def check(media):
+        value = media.get(metric)
+        if value is None:
+            return (Status.OK, None)
+        status = threshold.get_status(value)
+        if status == Status.OK:
+            return (status, None)
+        return (status, f"{metric} {value_text(value, uom)}")
+    return check
+
+def vendor_check(metric, uom):
+    alert = f"{metric}-alert"
+    def check(media):
+        value = media.get(metric)
+        limits = media.get(alert)
+        # no limits or not supported by the SFP
+        if value is None or not limits or not limits.get('high-alarm', 0) > limits.get('low-alarm', 0):
+            return (Status.OK, None)
+        for name, status, compare, relation in LIMITS:
+            limit = limits.get(name)
+            if limit is not None and compare(value, limit):
+                return (status, f"{metric} {value_text(value, uom)} {relation} {name} {limit}")
+        return (Status.OK, None)
+    return check
+
+def value_text(value, uom):
+    if uom == "uW":
+        dbm = f"{10 * math.log10(value / 1000):.1f} dBm" if value > 0 else "no light"
+        return f"{value} uW ({dbm})"
+    return f"{value} {uom}"
+
+def plugin(check):
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    checks = compile_checks(parse_thresholds(args.threshold))
+    media_filter = compile_filter(args, text_fields=('name', 'alias', 'vendor', 'serial'))
+
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+    response = plan.fetch(return_exceptions=True)
+    classifier = classifier_for(api.version(True), is_director(response['chassis']['chassis']))
+
+    counts = {Status.OK: 0, Status.WARNING: 0, Status.CRITICAL: 0}
+    temperature_max = None
+    for vf,media_rdp in response['media'].items():
+        VF = "" if vf == 'novf' else f"VF {vf:3} "
+        # ports of the virtual fabric by name
+        ports = {}
+        for intf in response['fibrechannel'].get(vf, {}).get('fibrechannel', []):
+            ports[intf['name']] = intf
+        for media in media_rdp['media-rdp']:
+            # media names are like fc/1/0, ports like 1/0
+            name = media['name'].split("/", 1)[1] if media['name'].startswith("fc/") else media['name']
+            port = ports.get(name, {})
+            state = classifier.oper_state(port.get('operational-status', 0),
+                                          port.get('operational-status-string', '')) if port else ''
+            item = {
+                'type': classifier.port_type(port.get('port-type', 0), port.get('port-type-string', ''),
+                                             port.get('port-scn', '')) if port else '',
+                'name': name,
+                'alias': port.get('user-friendly-name', ''),
+                'enabled': port.get('is-enabled-state', True),
+                'state': state,
+                'vendor': media.get('vendor-name', ''),
+                'serial': media.get('serial-number', ''),
+                'vf': '' if vf == 'novf' else vf,
+            }
+            if not media_filter(item):
+                continue
+            # without the port, e.g. its virtual fabric skipped at the deadline,
+            # the laser may be off as well
+            online = bool(port) and state.lower().startswith("online")
+
+            worst = Status.OK
+            problems = []
+            for metric, evaluate in checks:
+                if metric in LASER_METRICS and not online:
+                    continue
+                status, text = evaluate(media)
+                if text:
+                    problems.append(text)
+                    worst = max(worst, status)
+            counts[worst] += 1
+            if problems:
+                check.add_message(worst, f"{VF}{name:5} {item['alias']:23} {', '.join(problems)}")
+            if media.get('temperature') is not None:
+                temperature_max = max(temperature_max or media['temperature'], media['temperature'])
+
+    checked = sum(counts.values())
+    check.add_perfdata(label="sfps", value=checked)
+    check.add_perfdata(label="sfps_warning", value=counts[Status.WARNING])
+    check.add_perfdata(label="sfps_critical", value=counts[Status.CRITICAL])
+    if temperature_max is not None:
+        check.add_perfdata(label="temperature_max", value=temperature_max, uom="C")
+
+    (code, message) = check.check_messages(separator="\n", separator_all="\n", allok=" ")
+    summary = f"checked {checked} SFPs"
+    if code != Status.OK:
+        summary += f", {counts[Status.CRITICAL]} critical, {counts[Status.WARNING]} warning"
+        message = f"{summary}\n{message}"
+    else:
+        message = summary
+    (code, message) = partial_result(code, message, plan.skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
+
+if __name__ == "__main__":
+    run()
@@ -20,7 +20,9 @@ import logging
 from monplugin import Check,Status
 from ..tools import cli
 from ..tools.helper import severity, convert_keys
-from ..tools.connect import broadcomAPI
+from ..tools.timing import api_perfdata
+from ..tools.filter import compile_filter
+from ..tools.plan import Endpoint, show_plan
 
 __cmd__ = "mgmt-interface-health"
 description = f"{__cmd__} mgmt-interface-health"
@@ -29,16 +31,23 @@ description = f"{__cmd__} mgmt-interface-health"
 logger = None
 args = None
 
-def run():
-    global logger
-    global args
+ENDPOINTS = [
+    Endpoint('interfaces', "rest/running/brocade-chassis/management-ethernet-interface"),
+]
+
+def get_parser():
     parser = cli.Parser()
     parser.set_epilog("Check for Management Interface Health")
     parser.set_description(description)
     parser.add_optional_arguments(cli.Argument.EXCLUDE,
-                                  cli.Argument.INCLUDE)
+                                  cli.Argument.INCLUDE,
+                                  cli.Argument.FILTER)
+    return parser
 
-    args = parser.get_args()
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
 
     # Setup module logging
     logger = logging.getLogger(__name__)
@@ -56,10 +65,12 @@ def run():
         check.exit(Status.UNKNOWN, f"{e}")
 
 def plugin(check):
-    base_url = f"https://{args.host}:{args.port}"
-    api = broadcomAPI(logger, base_url, args.username, args.password, args.sessionfile)
-    response = api.make_request("GET", "rest/running/brocade-chassis/management-ethernet-interface")
-    ifaces = convert_keys(response)
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+    ifaces = convert_keys(plan.fetch()['interfaces'])
 
     ##
     ## Single int switch
@@ -69,6 +80,7 @@ def plugin(check):
         logger.info(f"seems to be a single switch")
         ifc = ifaces.management_ethernet_interface[0]
         logger.debug(f"interface -> {ifc}")
+        api_perfdata(check, api, args)
         check.exit(Status.OK, f"{ifc.cp_name} interface {ifc.interface_name} {ifc.speed}/{ifc.duplex}-duplex")
         # finish here
     else:
@@ -78,7 +90,12 @@ def plugin(check):
     ## Multi interface switch
     ##
     cp = {}
+    # include / exclude match on the CP name
+    cp_filter = compile_filter(args, text_fields=('cp',))
     for int in ifaces.management_ethernet_interface:
+        if not cp_filter({'cp': int.cp_name, 'name': int.interface_name}):
+            logger.info(f"skip {int.cp_name} {int.interface_name} include / exclude match")
+            continue
         if int.cp_name not in cp:
             cp[int.cp_name] = []
         cp[int.cp_name].append(int)
@@ -106,6 +123,7 @@ def plugin(check):
             check.add_message(Status.OK, out)
 
     (code, message) = check.check_messages(separator="\n")
+    api_perfdata(check, api, args)
     if code == Status.OK:
         check.exit(code=code,message=f"all interfaces are running\n{message}")
     else:
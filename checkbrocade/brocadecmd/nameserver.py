@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+from monplugin import Check,Status
+from checkbrocade import CheckBrocadeDeadline
+from ..tools import cli
+from ..tools.helper import severity, partial_result
+from ..tools.timing import api_perfdata
+from ..tools.counterstate import state_path
+from ..tools.loginstate import LoginBaseline, login_record, parse_record, diff_logins
+from ..tools.plan import Endpoint, show_plan
+
+__cmd__ = "nameserver"
+description = f"{__cmd__} logins of the name server compared with a baseline"
+"""
+"""
+logger = None
+args = None
+
+ENDPOINTS = [
+    Endpoint('logins', "rest/running/brocade-name-server/fibrechannel-name-server", per_vf=True, stream=True),
+]
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Compares the logins (port id and WWPN) of the name server with a baseline.\n"
+                      "Missing logins are critical, new logins a warning. The first run and\n"
+                      "--rebaseline store the current logins as baseline, it is kept until then.")
+    parser.set_description(description)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--rebaseline'],
+        'options': {
+            'action': 'store_true',
+            'help': 'store the current logins as the new baseline',
+        }},
+        {
+        'name_or_flags': ['--max-lines'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 50,
+            'help': 'lines of missing and new logins shown, default is 50',
+        }},
+        {
+        'name_or_flags': ['--state-dir'],
+        'options': {
+            'action': 'store',
+            'help': 'directory for the baseline, default is the temp directory',
+        }
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def login_text(VF, change, record, entry=None):
+    _, port_id, wwpn = parse_record(record)
+    text = f"{VF}{change:7} {port_id} {wwpn}"
+    if entry:
+        name = entry.get('port-symbolic-name') or entry.get('node-symbolic-name') or ''
+        text += f" {name}".rstrip()
+    return text
+
+def plugin(check):
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+
+    path = state_path(args.state_dir, f"{args.host}:{args.port}", "nameserver")
+    logins = 0
+    fetched = {}
+    missing = []
+    added = []
+    skipped = []
+    with LoginBaseline(path) as baseline:
+        index = None if args.rebaseline else baseline.index
+        for vf,endpoint in plan.urls('logins').items():
+            VF = "" if vf == 'novf' else f"VF {vf:3} "
+            fid = 0 if vf == 'novf' else int(vf)
+            records = []
+            # name server entries of new logins, just for the output
+            entries = {}
+            try:
+                for entry in api.stream_request(endpoint, 'fibrechannel-name-server'):
+                    record = login_record(fid, entry['port-id'], entry['port-name'])
+                    records.append(record)
+                    if index is not None and record not in index:
+                        entries[record] = entry
+            except CheckBrocadeDeadline:
+                skipped.append(endpoint)
+                continue
+            records.sort()
+            logins += len(records)
+            fetched[fid] = records
+            if index is not None:
+                (gone, new) = diff_logins(index.fabric(fid), records)
+                missing.extend(login_text(VF, "missing", record) for record in gone)
+                added.extend(login_text(VF, "new", record, entries.get(record)) for record in new)
+
+        if index is None:
+            # the baseline of virtual fabrics skipped at the deadline is kept
+            kept = [] if baseline.index is None else [r for r in baseline.index if parse_record(r)[0] not in fetched]
+            records = kept + [record for current in fetched.values() for record in current]
+    if index is None:
+        stored = LoginBaseline.write(path, records)
+        logger.info(f"stored {stored} logins in {path}")
+
+    check.add_perfdata(label="logins", value=logins)
+    if index is None:
+        (code, message) = (Status.OK, f"stored baseline of {logins} logins")
+    else:
+        check.add_perfdata(label="logins_missing", value=len(missing))
+        check.add_perfdata(label="logins_new", value=len(added))
+        code = Status.CRITICAL if missing else (Status.WARNING if added else Status.OK)
+        if code == Status.OK:
+            message = f"{logins} logins match the baseline"
+        else:
+            lines = missing + added
+            if len(lines) > args.max_lines:
+                lines = lines[:args.max_lines] + [f"{len(lines) - args.max_lines} more lines, see --max-lines"]
+            message = (f"{logins} logins, {len(missing)} missing and {len(added)} new since the baseline"
+                       f", --rebaseline accepts them\n" + "\n".join(lines))
+    (code, message) = partial_result(code, message, skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+import time
+import zlib
+from monplugin import Check,Status,Threshold
+from ..tools import cli
+from ..tools.helper import severity, partial_result
+from ..tools.timing import api_perfdata
+from ..tools.filter import compile_filter
+from ..tools.counterstate import CounterState, state_path
+from ..tools.plan import Endpoint, show_plan
+
+__cmd__ = "port-errors"
+description = f"{__cmd__} error rates of fibrechannel ports"
+"""
+"""
+logger = None
+args = None
+
+ENDPOINTS = [
+    Endpoint('statistics', "rest/running/brocade-interface/fibrechannel-statistics", per_vf=True),
+]
+
+COUNTERS = [
+    "crc-errors",
+    "in-crc-errors",
+    "link-failures",
+    "loss-of-sync",
+    "loss-of-signal",
+    "invalid-transmission-words",
+    "encoding-disparity-errors",
+    "bad-eofs-received",
+    "frames-too-long",
+    "truncated-frames",
+    "address-errors",
+    "delimiter-errors",
+    "primitive-sequence-protocol-error",
+]
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Error counters of fibrechannel-statistics as rates per second since the last run.\n"
+                      "The previous counters are kept in a state file per switch and counter set,\n"
+                      "the first run only stores them. Thresholds apply to the rate of every counter\n"
+                      "and port.")
+    parser.set_description(description)
+    parser.add_optional_arguments(cli.Argument.WARNING,
+                                  cli.Argument.CRITICAL,
+                                  cli.Argument.EXCLUDE,
+                                  cli.Argument.INCLUDE,
+                                  cli.Argument.FILTER)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--counter'],
+        'options': {
+            'action': 'store',
+            'nargs': '+',
+            'choices': COUNTERS,
+            'default': ["crc-errors", "link-failures", "loss-of-sync", "loss-of-signal", "invalid-transmission-words"],
+            'help': 'error counters to check, default is crc-errors link-failures loss-of-sync\n'
+                    'loss-of-signal invalid-transmission-words',
+        }},
+        {
+        'name_or_flags': ['--state-dir'],
+        'options': {
+            'action': 'store',
+            'help': 'directory for the counter state files, default is the temp directory',
+        }
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def plugin(check):
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+    # the counters of skipped virtual fabrics keep their previous sample
+    statistics = plan.fetch(return_exceptions=True)['statistics']
+
+    # in the order of COUNTERS, the state does not depend on the order of --counter
+    counters = [c for c in COUNTERS if c in args.counter]
+    threshold = Threshold(args.warning or None, args.critical or None)
+    port_filter = compile_filter(args, text_fields=('name',))
+
+    # a state per counter set, services with different --counter keep their own samples
+    name = f"port-errors-{zlib.crc32(','.join(counters).encode()):08x}"
+    state = CounterState(state_path(args.state_dir, f"{args.host}:{args.port}", name), counters)
+    if not state.load():
+        logger.info(f"no previous counters in {state.path}")
+
+    now = time.time()
+    port_count = 0
+    new_ports = 0
+    totals = [0.0] * len(counters)
+    for vf,response in statistics.items():
+        VF = "" if vf == 'novf' else f"VF {vf:3} "
+        for port in response['fibrechannel-statistics']:
+            key = port['name'] if vf == 'novf' else f"{vf}:{port['name']}"
+            # samples of the switch if available, they are taken per virtual fabric
+            timestamp = port.get('time-generated') or now
+            rates = state.rates(key, timestamp, [port.get(c, 0) for c in counters])
+            if not port_filter({'name': port['name'], 'vf': '' if vf == 'novf' else vf}):
+                continue
+            port_count += 1
+            if rates is None:
+                new_ports += 1
+                continue
+            for i,rate in enumerate(rates):
+                if rate is None:
+                    logger.info(f"{VF}{port['name']} {counters[i]} was reset")
+                    continue
+                totals[i] += rate
+                status = threshold.get_status(rate)
+                if status != Status.OK:
+                    check.add_message(status, f"{VF}{port['name']} {counters[i]} {rate:.3f}/s")
+                logger.debug(f"{VF}{port['name']} {counters[i]} {rate:.3f}/s")
+
+    state.save()
+
+    for counter,total in zip(counters, totals):
+        check.add_perfdata(label=counter, value=round(total, 3))
+
+    (code, message) = check.check_messages(separator="\n")
+    if new_ports == port_count:
+        (code, message) = (Status.OK, f"stored counters of {port_count} ports, rates follow with the next run")
+    else:
+        summary = f"checked {port_count} ports"
+        if new_ports:
+            summary += f", {new_ports} new"
+        message = f"{summary}\n{message}" if message else summary
+    (code, message) = partial_result(code, message, plan.skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import heapq
+import logging
+import time
+from collections import namedtuple
+from monplugin import Check,Status,Threshold
+from ..tools import cli
+from ..tools.helper import severity, bytes_to_human, partial_result
+from ..tools.timing import api_perfdata
+from ..tools.filter import compile_filter
+from ..tools.counterstate import CounterState, state_path
+from ..tools.porttable import PortTable
+from ..tools.classify import classifier_for, is_director
+from ..tools.plan import Endpoint, show_plan
+
+__cmd__ = "port-utilization"
+description = f"{__cmd__} throughput and utilization of fibrechannel ports"
+"""
+"""
+logger = None
+args = None
+
+ENDPOINTS = [
+    Endpoint('chassis', "rest/running/brocade-chassis/chassis"),
+    # negotiated speed, type and state of the ports
+    Endpoint('fibrechannel', "rest/running/brocade-interface/fibrechannel", per_vf=True),
+    Endpoint('statistics', "rest/running/brocade-interface/fibrechannel-statistics", per_vf=True),
+]
+
+COUNTERS = ["in-octets", "out-octets"]
+
+# rates of a port since the last run, utilization in percent of the speed
+PortRate = namedtuple('PortRate', ['utilization', 'rx', 'tx', 'key', 'VF', 'name', 'alias', 'speed'])
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Receive (rx) and transmit (tx) rates in bytes per second since the last run and\n"
+                      "the utilization of the busier direction in percent of the negotiated speed.\n"
+                      "The previous counters are kept in a state file per switch, the first run\n"
+                      "only stores them. Thresholds apply to the utilization of every port,\n"
+                      "perfdata is given for the busiest ports and the chassis totals.")
+    parser.set_description(description)
+    parser.add_optional_arguments(cli.Argument.WARNING,
+                                  cli.Argument.CRITICAL,
+                                  cli.Argument.EXCLUDE,
+                                  cli.Argument.INCLUDE,
+                                  cli.Argument.FILTER)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--port-type'],
+        'options': {
+            'action': 'store',
+            'default': ['all'],
+            'nargs': '+',
+            'help': "list of port-type to check, e.g. e-port f-port, default is all",
+        }},
+        {
+        'name_or_flags': ['--top'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 10,
+            'help': 'number of busiest ports shown with perfdata, default is 10',
+        }},
+        {
+        'name_or_flags': ['--state-dir'],
+        'options': {
+            'action': 'store',
+            'help': 'directory for the counter state files, default is the temp directory',
+        }
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def plugin(check):
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+    # the counters of skipped virtual fabrics keep their previous sample
+    response = plan.fetch(return_exceptions=True)
+
+    classifier = classifier_for(api.version(True), is_director(response['chassis']['chassis']))
+    port_filter = compile_filter(args, args.port_type)
+    threshold = Threshold(args.warning or None, args.critical or None)
+
+    state = CounterState(state_path(args.state_dir, f"{args.host}:{args.port}", "port-utilization"), COUNTERS)
+    if not state.load():
+        logger.info(f"no previous counters in {state.path}")
+
+    totals = {'ports': 0, 'new': 0, 'rx': 0.0, 'tx': 0.0, 'max': 0.0}
+
+    def port_rates():
+        """ rates of the checked ports, one at a time for the top N heap """
+        now = time.time()
+        for vf,statistics in response['statistics'].items():
+            if vf not in response['fibrechannel']:
+                continue
+            VF = "" if vf == 'novf' else f"VF {vf:3} "
+            table = PortTable(response['fibrechannel'][vf]['fibrechannel'])
+            table.classify(classifier)
+            rows = {table.name[i]: i for i in table.select(port_filter, '' if vf == 'novf' else vf)}
+            for port in statistics['fibrechannel-statistics']:
+                key = port['name'] if vf == 'novf' else f"{vf}:{port['name']}"
+                # samples of the switch if available, they are taken per virtual fabric
+                timestamp = port.get('time-generated') or now
+                rates = state.rates(key, timestamp, [port.get(c, 0) for c in COUNTERS])
+                row = rows.get(port['name'])
+                if row is None:
+                    continue
+                totals['ports'] += 1
+                # new port or reset counters, rated with the next run
+                if rates is None or None in rates:
+                    totals['new'] += 1
+                    continue
+                rx, tx = rates
+                speed = table.speed[row]
+                utilization = max(rx, tx) * 8 * 100 / speed if speed > 0 else 0.0
+                totals['rx'] += rx
+                totals['tx'] += tx
+                totals['max'] = max(totals['max'], utilization)
+                rate = PortRate(utilization, rx, tx, key, VF, port['name'], table.alias[row], speed)
+                status = threshold.get_status(utilization)
+                if status != Status.OK:
+                    check.add_message(status, render(rate))
+                logger.debug(render(rate))
+                yield rate
+
+    # just the busiest ports are kept while all are rated
+    top = heapq.nlargest(args.top, port_rates(), key=lambda r: r.utilization)
+    state.save()
+
+    if totals['new'] == totals['ports']:
+        (code, message) = (Status.OK, f"stored counters of {totals['ports']} ports, rates follow with the next run")
+    else:
+        for rate in top:
+            check.add_perfdata(label=f"{rate.key}_rx", value=round(rate.rx), uom="B")
+            check.add_perfdata(label=f"{rate.key}_tx", value=round(rate.tx), uom="B")
+            check.add_perfdata(label=f"{rate.key}_utilization", value=round(rate.utilization, 2), uom="%",
+                               warning=args.warning, critical=args.critical)
+        check.add_perfdata(label="rx", value=round(totals['rx']), uom="B")
+        check.add_perfdata(label="tx", value=round(totals['tx']), uom="B")
+        check.add_perfdata(label="utilization_max", value=round(totals['max'], 2), uom="%")
+
+        (code, message) = check.check_messages(separator="\n")
+        summary = (f"checked {totals['ports']} ports, rx {bytes_to_human(totals['rx'])}/s"
+                   f" tx {bytes_to_human(totals['tx'])}/s")
+        if totals['new']:
+            summary += f", {totals['new']} new"
+        lines = [summary]
+        if message:
+            lines.append(message)
+        if top:
+            lines.append(f"busiest {len(top)} ports:")
+            lines.extend(render(rate) for rate in top)
+        message = "\n".join(lines)
+    (code, message) = partial_result(code, message, plan.skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
+
+def render(rate):
+    return (f"{rate.VF}{rate.name:5} {rate.alias:23} {rate.utilization:5.1f}% of {rate.speed // 10**9}G"
+            f" rx {bytes_to_human(rate.rx)}/s tx {bytes_to_human(rate.tx)}/s")
+
+if __name__ == "__main__":
+    run()
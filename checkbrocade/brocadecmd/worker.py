@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+import signal
+from monplugin import Check,Status
+from ..tools import cli
+from ..tools.helper import severity
+from ..tools.worker import Worker
+
+__cmd__ = "worker"
+description = f"{__cmd__} serves checks over a Unix socket"
+"""
+"""
+logger = None
+args = None
+
+def get_parser():
+    parser = cli.Parser(connection=False)
+    parser.set_epilog("Keeps the interpreter, the API sessions and connections per switch warm.\n"
+                      "check_brocade forwards checks to the worker if CHECK_BROCADE_SOCKET is set\n"
+                      "to the socket, and runs them itself if no worker is listening.")
+    parser.set_description(description)
+    parser.add_required_arguments({
+        'name_or_flags': ['--socket'],
+        'options': {
+            'action': cli.EnvDefault,
+            'envvar': 'CHECK_BROCADE_SOCKET',
+            'help': 'path of the Unix socket, can also be set by env CHECK_BROCADE_SOCKET',
+        }})
+    parser.add_optional_arguments({
+        'name_or_flags': ['--threads'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 16,
+            'help': 'checks running at the same time, default is 16',
+        }},
+        {'name_or_flags': ['--refresh-idle'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 300,
+            'help': 'verify tokens not used for these seconds so they do not expire,\n'
+                    'default is 300',
+        },
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        logger.disabled = False
+        logger.setLevel(severity(args.verbose))
+
+    # the worker runs until it is stopped, every check has its own timeout
+    signal.alarm(0)
+    signal.signal(signal.SIGTERM, stop_handler)
+
+    check = Check()
+    try:
+        plugin(check)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+    check.exit(Status.OK, "worker stopped")
+
+def stop_handler(signum, frame):
+    raise KeyboardInterrupt()
+
+def plugin(check):
+    worker = Worker(logger, threads=args.threads, refresh_idle=args.refresh_idle)
+    worker.serve(args.socket)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+from monplugin import Check,Status
+from checkbrocade import CheckBrocadeDeadline
+from ..tools import cli
+from ..tools.helper import severity, partial_result
+from ..tools.timing import api_perfdata
+from ..tools.counterstate import state_path
+from ..tools.zonestate import ZoneDigest, ZoneState, zone_members, zone_diff
+from ..tools.plan import Endpoint, show_plan
+
+__cmd__ = "zone-config"
+description = f"{__cmd__} changes of the effective zone configuration"
+"""
+"""
+logger = None
+args = None
+
+ENDPOINTS = [
+    Endpoint('zones', "rest/running/brocade-zone/effective-configuration", per_vf=True, stream=True),
+]
+
+def get_parser():
+    parser = cli.Parser()
+    parser.set_epilog("Compares the effective zone configuration with a baseline. A digest\n"
+                      "independent of the order of zones and members is computed while the\n"
+                      "configuration is received. Only if it changed the configuration is read\n"
+                      "again to show the added, removed and changed zones, a warning until\n"
+                      "--rebaseline. The first run and --rebaseline store it as baseline.")
+    parser.set_description(description)
+    parser.add_optional_arguments({
+        'name_or_flags': ['--rebaseline'],
+        'options': {
+            'action': 'store_true',
+            'help': 'store the current zone configuration as the new baseline',
+        }},
+        {
+        'name_or_flags': ['--max-lines'],
+        'options': {
+            'action': 'store',
+            'type': int,
+            'default': 50,
+            'help': 'lines of the zone changes shown, default is 50',
+        }},
+        {
+        'name_or_flags': ['--state-dir'],
+        'options': {
+            'action': 'store',
+            'help': 'directory for the state files, default is the temp directory',
+        }
+    })
+    return parser
+
+def run():
+    global logger
+    global args
+    args = get_parser().get_args()
+
+    # Setup module logging
+    logger = logging.getLogger(__name__)
+    logger.disabled=True
+    if args.verbose:
+        for log_name, log_obj in logging.Logger.manager.loggerDict.items():
+            log_obj.disabled = False
+            logging.getLogger(log_name).setLevel(severity(args.verbose))
+
+    check = Check()
+    try:
+        plugin(check)
+    except Exception as e:
+        logger.error(f"{e}")
+        check.exit(Status.UNKNOWN, f"{e}")
+
+def collect(api, endpoint, baseline):
+    """
+    digest and zones of the configuration, the members of zones
+    unchanged since baseline are taken from there
+    """
+    digest = ZoneDigest()
+    zones = {}
+    for zone in api.stream_request(endpoint, 'enabled-zone'):
+        h = digest.add(zone)
+        previous = baseline.get(zone['zone-name'])
+        if previous and previous['hash'] == h:
+            zones[zone['zone-name']] = previous
+        else:
+            zones[zone['zone-name']] = {'hash': h, 'members': zone_members(zone)}
+    return (digest, zones)
+
+def diff_lines(VF, added, removed, changed, zones):
+    for zone in added:
+        yield f"{VF}+ {zone}: {' '.join(zones[zone]['members'])}"
+    for zone in removed:
+        yield f"{VF}- {zone}"
+    for zone, members_added, members_removed in changed:
+        text = " ".join([f"+{m}" for m in members_added] + [f"-{m}" for m in members_removed])
+        yield f"{VF}~ {zone}: {text or 'zone type changed'}"
+
+def plugin(check):
+    # requests is imported with the connection only, --help stays fast
+    from ..tools.connect import api_from_args
+    api = api_from_args(logger, args)
+    plan = api.plan(ENDPOINTS)
+    show_plan(check, plan, args)
+
+    state = ZoneState(state_path(args.state_dir, f"{args.host}:{args.port}", "zone-config"))
+    zone_count = 0
+    stored = []
+    changes = []
+    skipped = []
+    for vf,endpoint in plan.urls('zones').items():
+        VF = "" if vf == 'novf' else f"VF {vf:3} "
+        try:
+            if state.digest(vf) is None or args.rebaseline:
+                digest, zones = collect(api, endpoint, {} if state.digest(vf) is None else state.baseline(vf))
+                state.store(vf, digest.hexdigest(), zones)
+                stored.append(VF.strip() or "fabric")
+                zone_count += len(zones)
+                continue
+
+            # the common case, just the hashes of the zones are kept
+            digest = ZoneDigest()
+            for zone in api.stream_request(endpoint, 'enabled-zone'):
+                digest.add(zone)
+            if digest.hexdigest() == state.digest(vf):
+                logger.info(f"{VF}zone configuration {digest.hexdigest()} unchanged")
+                zone_count += len(digest.hashes)
+                continue
+
+            logger.info(f"{VF}zone configuration changed from {state.digest(vf)} to {digest.hexdigest()}")
+            baseline = state.baseline(vf)
+            digest, zones = collect(api, endpoint, baseline)
+            (added, removed, changed) = zone_diff(baseline, zones)
+            changes.append(f"{VF}{len(added)} zones added, {len(removed)} removed, {len(changed)} changed")
+            changes.extend(diff_lines(VF, added, removed, changed, zones))
+            # the baseline is kept until the change is accepted
+            zone_count += len(zones)
+        except CheckBrocadeDeadline:
+            skipped.append(endpoint)
+    if stored:
+        state.save()
+
+    check.add_perfdata(label="zones", value=zone_count)
+    if changes:
+        if len(changes) > args.max_lines:
+            changes = changes[:args.max_lines] + [f"{len(changes) - args.max_lines} more lines, see --max-lines"]
+        (code, message) = (Status.WARNING, "zone configuration changed since the baseline, --rebaseline accepts it\n"
+                           + "\n".join(changes))
+    elif stored:
+        (code, message) = (Status.OK, f"stored baseline of {zone_count} zones")
+    else:
+        (code, message) = (Status.OK, f"zone configuration of {zone_count} zones unchanged")
+    (code, message) = partial_result(code, message, skipped)
+    api_perfdata(check, api, args)
+    check.exit(code=code,message=message)
+
+if __name__ == "__main__":
+    run()
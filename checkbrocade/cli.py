@@ -18,26 +18,14 @@
 
 import sys
 import os
-import signal
 import logging
 import importlib
-import pkgutil
-import checkbrocade.brocadecmd
 #from checkbrocade.tools import session 
 from checkbrocade import CheckBrocadeTimeout
 from checkbrocade.tools import cli
-import requests
-import urllib3.exceptions
-requests.packages.urllib3.disable_warnings()
-
-def timeout_handler(signum, frame):
-    raise CheckBrocadeTimeout("Timeout reached")
-
-def set_timeout(seconds=None, handler=None):
-    if seconds is None:
-        seconds = int(os.environ.get("TIMEOUT", "60"))
-    signal.signal(signal.SIGALRM, (handler or timeout_handler))
-    signal.alarm(seconds)
+from checkbrocade.tools import registry
+from checkbrocade.tools.cli import set_timeout
+# requests and urllib3 are imported by tools.connect when a check connects
 
 def dependencies():
     failed=[]
@@ -51,6 +39,11 @@ def dependencies():
             print(f" - {p}")
         sys.exit(3)
 
+def connection_error(e):
+    """ urllib3 NewConnectionError, urllib3 is only loaded if a check connected """
+    exceptions = sys.modules.get("urllib3.exceptions")
+    return exceptions is not None and isinstance(e, exceptions.NewConnectionError)
+
 def run():
     module = None
     try:
@@ -61,11 +54,11 @@ def run():
     set_timeout()
     
     if module:
-        mod = "".join(c for c in module if c.isalnum())
+        mod = registry.module_for(module)
         try:
             runner = importlib.import_module(f"checkbrocade.brocadecmd.{mod}")
         except ModuleNotFoundError as e:
-            if not e.name.startswith("brocadecmd."):
+            if not e.name.startswith("checkbrocade.brocadecmd."):
                 raise e
             print(f"command not found: {module}")
             sys.exit(3)
@@ -75,22 +68,35 @@ def run():
             sys.argv[0] = f"{sys.argv[0]} {module}"
         runner.run()
     else:
-        p = {}
-        modules = set()
-        for loader, name, is_pkg in pkgutil.walk_packages(checkbrocade.brocadecmd.__path__):
-            if not is_pkg:
-                full_name = checkbrocade.brocadecmd.__name__ + '.' + name
-                p[name] = importlib.import_module(full_name)
-                if hasattr(p[name], '__cmd__') and p[name].__cmd__:
-                    modules.add(p[name].__cmd__)
         print("Specify cmd, one of:\n")
-        for mod in sorted(modules):
+        for mod in sorted(registry.commands()):
             print(f" {mod}")
         print()
 
+def forward():
+    """ hand the check to the worker at CHECK_BROCADE_SOCKET, exits if it did """
+    path = os.environ.get("CHECK_BROCADE_SOCKET")
+    if not path or len(sys.argv) < 2:
+        return
+    from checkbrocade.tools import worker
+    if sys.argv[1] in worker.LOCAL_COMMANDS:
+        return
+    try:
+        reply = worker.forward(path, sys.argv)
+    except Exception as e:
+        print(f"UNKNOWN - worker failed: {e}")
+        sys.exit(3)
+    if reply is None:
+        # no worker listening, run the check here
+        return
+    sys.stdout.write(reply['stdout'])
+    sys.stderr.write(reply['stderr'])
+    sys.exit(reply['code'])
+
 def main():
     import traceback
     
+    forward()
     dependencies()
     
     logging.basicConfig(format='%(asctime)s %(levelname)s %(module)s %(funcName)s %(lineno)d %(message)s', stream=sys.stdout)
@@ -104,14 +110,14 @@ def main():
             sys.exit(3)
         else:
             sys.exit(e.code)
-    except urllib3.exceptions.NewConnectionError as e:
-        print(f"UNKNOWN - connection issue {e}")
-        sys.exit(3)
     except CheckBrocadeTimeout as e:
         print("UNKNOWN - Timeout reached")
         traceback.print_exc(file=sys.stdout)
         sys.exit(3)
     except Exception as e:
+        if connection_error(e):
+            print(f"UNKNOWN - connection issue {e}")
+            sys.exit(3)
         print(f"UNKNOWN - Unhandled exception: {e}")
         traceback.print_exc()
         sys.exit(3)
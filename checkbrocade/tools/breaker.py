@@ -0,0 +1,174 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import contextlib
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Any
+from checkbrocade import CheckBrocadeCircuitOpen
+from .helper import atomic_write
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per switch shared by all processes on this host.
+
+    After threshold consecutive failed requests (connection errors, timeouts
+    and 5xx responses) the breaker opens and requests to the switch fail fast
+    for cooldown seconds. Then the breaker is half-open: one request is sent
+    as probe, its success closes the breaker, a failure opens it again. Other
+    processes fail fast while the probe runs, threads of the probing process
+    wait for its result.
+
+    The state is a small JSON file in directory, read without lock and
+    changed under an flock, so a closed breaker costs one read per request.
+
+    Example:
+        breaker = CircuitBreaker(logger, "/var/tmp/check_brocade", "switch01:443")
+        probe = breaker.allow()        # raises CheckBrocadeCircuitOpen
+        ... send the request ...
+        breaker.success(probe)         # or breaker.failure(probe, "HTTP 503")
+    """
+
+    def __init__(self, logger, directory: str, host: str, threshold: int = 5, cooldown: int = 60):
+        self.logger = logger
+        self.host = host
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        name = re.sub(r'[^\w.-]', '_', host)
+        self.path = os.path.join(directory, f"{name}.breaker")
+        # held by the thread sending the probe of this process
+        self._probe = threading.Lock()
+        self._probing = False
+        # failures seen, a success has to reset them in the state file
+        self._dirty = True
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, logger, args):
+        """ create the breaker from --circuit-breaker, None if not enabled """
+        if not getattr(args, 'circuit_breaker', None):
+            return None
+        return cls(logger, args.circuit_breaker, f"{args.host}:{args.port}",
+                   args.breaker_threshold, args.breaker_cooldown)
+
+    def read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state.get('state') in (CLOSED, OPEN, HALF_OPEN):
+                return state
+            self.logger.warning(f"unknown circuit breaker state in {self.path}")
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            self.logger.warning(f"invalid circuit breaker state {self.path}: {e}")
+        return {'state': CLOSED, 'failures': 0}
+
+    def write(self, state: Dict[str, Any]):
+        atomic_write(self.path, json.dumps(state))
+
+    @contextlib.contextmanager
+    def locked(self):
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def open_error(self, state: Dict[str, Any], now: float) -> CheckBrocadeCircuitOpen:
+        since = time.strftime("%H:%M:%S", time.localtime(state['opened']))
+        message = (f"circuit breaker for {self.host} open since {since} after "
+                   f"{state['failures']} failed requests, last: {state.get('error')}")
+        if state['state'] == HALF_OPEN:
+            message += ", probing the switch"
+        else:
+            message += f", next probe in {max(1, round(state['opened'] + self.cooldown - now))}s"
+        return CheckBrocadeCircuitOpen(message)
+
+    def allow(self) -> bool:
+        """
+        Raise CheckBrocadeCircuitOpen if the request has to fail fast.
+        Returns True if the request is the probe of a half-open breaker,
+        its result has to be reported with success() or failure().
+        """
+        while True:
+            state = self.read()
+            if state['state'] == CLOSED:
+                self._dirty = state['failures'] > 0
+                return False
+            now = time.time()
+            if state['state'] == OPEN and now < state['opened'] + self.cooldown:
+                raise self.open_error(state, now)
+            if state['state'] == HALF_OPEN and now < state['probe'] + self.cooldown:
+                if not self._probing:
+                    raise self.open_error(state, now)
+                # another thread of this process sends the probe, wait for its result
+                with self._probe:
+                    pass
+                continue
+            # cool-down is over or the last probe got lost
+            with self.locked():
+                if self.read() != state:
+                    continue
+                self._probe.acquire()
+                self._probing = True
+                self.write(dict(state, state=HALF_OPEN, probe=now))
+            self.logger.info(f"circuit breaker for {self.host} half-open, sending a probe")
+            return True
+
+    def success(self, probe: bool):
+        if not (probe or self._dirty):
+            return
+        with self.locked():
+            state = self.read()
+            # requests sent before the breaker opened do not close it
+            if probe or state['state'] == CLOSED and state['failures']:
+                if probe:
+                    self.logger.info(f"circuit breaker for {self.host} closed, probe succeeded")
+                self.write({'state': CLOSED, 'failures': 0})
+            self._dirty = False
+        if probe:
+            self.release(probe)
+
+    def failure(self, probe: bool, error: str):
+        self._dirty = True
+        with self.locked():
+            state = self.read()
+            now = time.time()
+            failures = state['failures'] + 1
+            if probe or state['state'] == CLOSED and failures >= self.threshold:
+                self.logger.error(f"circuit breaker for {self.host} opened after {failures} "
+                                  f"failed requests for {self.cooldown}s, last: {error}")
+                self.write({'state': OPEN, 'failures': failures, 'opened': now, 'error': error})
+            elif state['state'] == CLOSED:
+                self.write(dict(state, failures=failures, error=error))
+        if probe:
+            self.release(probe)
+
+    def release(self, probe: bool):
+        """ end the probe, without result the next probe follows after the cool-down """
+        if probe:
+            self._probing = False
+            self._probe.release()
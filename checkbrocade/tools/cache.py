@@ -0,0 +1,143 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlsplit, parse_qs
+from typing import Optional, Dict, Any, Callable, List
+from .helper import atomic_write
+
+# counters diffed between runs (port-errors, port-utilization) need a new
+# sample every run, --cache-ttl ENDPOINT=SECONDS overrides it
+DEFAULT_ENDPOINT_TTL = {
+    "brocade-interface/fibrechannel-statistics": 0,
+}
+
+
+class ResponseCache:
+    """
+    On disk cache for API responses shared by all plugin invocations.
+
+    Entries are keyed by host, endpoint and vf-id. Every key has its own
+    lock file, so if several processes miss the same key only the first one
+    fetches from the switch while the others wait and read its result.
+
+    Example:
+        cache = ResponseCache(logger, "/var/tmp/check_brocade", ttl=30,
+                              endpoint_ttl={"brocade-chassis/chassis": 300})
+        response = cache.fetch(base_url, endpoint, None, lambda: api.request(...))
+    """
+
+    def __init__(self, logger, directory: str, ttl: int = 30, endpoint_ttl: Optional[Dict[str, int]] = None):
+        self.logger = logger
+        self.directory = directory
+        self.ttl = ttl
+        self.endpoint_ttl = dict(DEFAULT_ENDPOINT_TTL, **(endpoint_ttl or {}))
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, logger, args):
+        """ create the cache from --cache-dir / --cache-ttl, None if not enabled """
+        if not getattr(args, 'cache_dir', None):
+            return None
+        ttl, endpoint_ttl = parse_ttl(args.cache_ttl or [])
+        return cls(logger, args.cache_dir, ttl, endpoint_ttl)
+
+    def ttl_for(self, endpoint: str) -> int:
+        """ the longest matching endpoint pattern wins """
+        path = urlsplit(endpoint).path
+        match = None
+        for pattern in self.endpoint_ttl:
+            if pattern in path and (match is None or len(pattern) > len(match)):
+                match = pattern
+        return self.endpoint_ttl[match] if match is not None else self.ttl
+
+    def key(self, host: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+        url = urlsplit(endpoint)
+        query = parse_qs(url.query)
+        vf = str((params or {}).get('vf-id') or query.get('vf-id', [''])[0])
+        # remaining query parameters change the response as well
+        rest = sorted((k, v) for k, v in query.items() if k != 'vf-id')
+        rest += sorted((str(k), str(v)) for k, v in (params or {}).items() if k != 'vf-id')
+        raw = f"{host}|{url.path.strip('/')}|{vf}|{rest}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str, ttl: int):
+        """ returns (True, response) for a fresh entry otherwise (False, None) """
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return (False, None)
+        age = time.time() - entry.get('time', 0)
+        if age < 0 or age >= ttl:
+            return (False, None)
+        self.logger.debug(f"cache hit for {entry.get('endpoint')} age {age:.1f}s")
+        return (True, entry.get('response'))
+
+    def store(self, host: str, endpoint: str, params: Optional[Dict[str, Any]], response) -> None:
+        if self.ttl_for(endpoint) <= 0:
+            return
+        entry = {'time': time.time(), 'host': host, 'endpoint': endpoint, 'response': response}
+        try:
+            atomic_write(self._path(self.key(host, endpoint, params)), json.dumps(entry))
+        except OSError as e:
+            self.logger.warning(f"unable to write cache entry for {endpoint}: {e}")
+
+    def fetch(self, host: str, endpoint: str, params: Optional[Dict[str, Any]], fetcher: Callable[[], Any]):
+        """ return a cached response or call fetcher once for all waiting processes """
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            return fetcher()
+        key = self.key(host, endpoint, params)
+        hit, response = self.get(key, ttl)
+        if hit:
+            return response
+
+        with open(os.path.join(self.directory, f"{key}.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # somebody else might have fetched it while we were waiting
+                hit, response = self.get(key, ttl)
+                if hit:
+                    return response
+                self.logger.debug(f"cache miss for {endpoint}")
+                response = fetcher()
+                self.store(host, endpoint, params, response)
+                return response
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def parse_ttl(values: List[str]):
+    """
+    parse ['30', 'brocade-chassis/chassis=300'] into
+    default ttl and endpoint specific ttl
+    """
+    ttl = 30
+    endpoint_ttl = {}
+    for value in values:
+        if '=' in value:
+            endpoint, seconds = value.rsplit('=', 1)
+            endpoint_ttl[endpoint.strip('/')] = int(seconds)
+        else:
+            ttl = int(value)
+    return (ttl, endpoint_ttl)
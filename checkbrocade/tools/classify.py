@@ -0,0 +1,126 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Port classification for fibrechannel ports.
+
+The strategy is chosen once per run from the FabricOS version and the
+chassis type, every port is then mapped through lookup tables.
+FabricOS >= 9.1.0 delivers port-type-string and operational-status-string,
+older versions only the numbers.
+"""
+
+import re
+from .helper import compare_versions
+
+PORT_TYPE = {
+    0: "unknown",
+    7: "e-port",
+    10: "g-port",
+    11: "u-port",
+    15: "f-port",
+    16: "l-port",
+    17: "fcoe-port",
+    19: "ex-port",
+    20: "d-port",
+    21: "sim-port",
+    22: "af-port",
+    23: "ae-port",
+    25: "ve-port",
+    26: "ethernet-flex-port",
+    29: "flex-port",
+    30: "n-port",
+    31: "mirror-port",
+    32: "icl-port",
+    33: "fc-lag-port",
+    32768: "lb-port",
+}
+
+# operational-status of fibrechannel ports, also the fallback of FabricOS
+# >= 9.1.0 for ports without operational-status-string. The numbers of the
+# extension tunnels and circuits (1 offline, 3 online warning, ...) are not
+# the ones of fibrechannel ports.
+OPER_STATE = {
+    0: "Undefined",
+    2: "Online",
+    3: "Offline",
+    5: "Faulty",
+    6: "Testing",
+}
+
+# icl port role on directors by port-scn
+ICL_ROLE = (
+    ("e-port", "icl-port (trunk master)"),
+    ("t-port", "icl-port (trunk slave)"),
+)
+
+
+def is_director(chassis) -> bool:
+    """ chassis dict of brocade-chassis/chassis """
+    return bool(re.search(r'^x\d', chassis['product-name'].lower())
+                and 'dcx' in chassis['vendor-part-number'].lower())
+
+
+class PortClassifier:
+    """
+    Maps the port-type and operational-status of ports to their names.
+    Results are kept per distinct input, so a chassis with thousands of
+    ports classifies only a handful of combinations.
+    Use classifier_for() to get the one matching the switch.
+    """
+
+    def __init__(self, strings: bool, director: bool, oper_table=OPER_STATE):
+        self.strings = strings
+        self.director = director
+        self.oper_table = oper_table
+        self._types = {}
+        self._states = {}
+
+    def port_type(self, code: int, string: str = "", scn: str = "") -> str:
+        key = (code, string, scn)
+        if key not in self._types:
+            ifType = string if self.strings and string else PORT_TYPE.get(code, f"unknown({code})")
+            if self.director and 'icl-port' in ifType:
+                for role, name in ICL_ROLE:
+                    if role in scn:
+                        ifType = name
+                        break
+            self._types[key] = ifType
+        return self._types[key]
+
+    def oper_state(self, code: int, string: str = "") -> str:
+        key = (code, string)
+        if key not in self._states:
+            if self.strings and string:
+                self._states[key] = string
+            else:
+                self._states[key] = self.oper_table.get(code, f"unknown({code})")
+        return self._states[key]
+
+
+_classifiers = {}
+
+
+def classifier_for(fabric_version: str, director: bool = False) -> PortClassifier:
+    """ classifier for a FabricOS version as returned by broadcomAPI.version(True) """
+    key = (fabric_version, director)
+    if key not in _classifiers:
+        if not re.match(r'^\d', str(fabric_version)):
+            # unknown version, take the strings if there are any
+            strings = True
+        else:
+            strings = bool(compare_versions("9.1.0", fabric_version))
+        _classifiers[key] = PortClassifier(strings, director)
+    return _classifiers[key]
@@ -18,18 +18,44 @@ import argparse
 import getpass
 import os
 import signal
+import threading
+import time
 from checkbrocade import CheckBrocadeTimeout
 
 __author__ = "ConSol"
 
+# seconds of the timeout kept to report what was done before the alarm
+DEADLINE_MARGIN = 2
+_deadline = None
+# deadlines of the runs in threads of the worker
+_thread = threading.local()
+
 def timeout_handler(signum, frame):
     raise CheckBrocadeTimeout("Timeout reached")
 
 def set_timeout(seconds=None, handler=None):
     if seconds is None:
-        seconds = int(os.environ.get("TIMEOUT", "30"))
+        seconds = int(os.environ.get("TIMEOUT", "60"))
     signal.signal(signal.SIGALRM, (handler or timeout_handler))
     signal.alarm(seconds)
+    set_deadline(seconds)
+
+def set_deadline(seconds, thread=False):
+    """
+    Budget of the REST requests of this run, ends DEADLINE_MARGIN seconds
+    (at most a quarter of the time) before the timeout. With thread it is
+    the budget of the run in the calling thread only.
+    """
+    global _deadline
+    value = time.monotonic() + seconds - min(DEADLINE_MARGIN, seconds / 4) if seconds else None
+    if thread:
+        _thread.deadline = value
+    else:
+        _deadline = value
+
+def deadline():
+    """ time.monotonic() the REST requests have to be done by, None without limit """
+    return getattr(_thread, 'deadline', _deadline)
     
 class EnvDefault(argparse.Action):
     def __init__(self, envvar, required=True, default=None, **kwargs):
@@ -57,11 +83,13 @@ class Parser:
         args = parser.get_args()
     """
 
-    def __init__(self):
+    def __init__(self, connection=True):
         """
         Defines two arguments groups.
         One for the standard arguments and one for sample specific arguments.
         The standard group cannot be extended.
+        Without connection the host, credential and sessionfile arguments
+        are left out, e.g. for commands working on several hosts.
         """
         self._parser = argparse.ArgumentParser(description='check_brocade',
                                                formatter_class=argparse.RawTextHelpFormatter,
@@ -70,36 +98,113 @@ class Parser:
         self._standard_args_group = self._parser.add_argument_group('standard arguments')
         self._specific_args_group = self._parser.add_argument_group('sample-specific arguments')
 
-        # because -h is reserved for 'help' we use -s for service
-        self._standard_args_group.add_argument('-H', '--host',
-                                               required=True,
+        if connection:
+            # because -h is reserved for 'help' we use -s for service
+            self._standard_args_group.add_argument('-H', '--host',
+                                                   required=True,
+                                                   action='store',
+                                                   help='Brocade device service address to connect to')
+
+            # because we want -p for password, we use -o for port
+            self._standard_args_group.add_argument('-P', '--port',
+                                                   type=int,
+                                                   default=443,
+                                                   action='store',
+                                                   help='Port to connect on')
+
+            self._standard_args_group.add_argument('-u', '--username',
+                                                   required=True,
+                                                   action='store',
+                                                   help='API User name to use when connecting to host')
+
+            self._standard_args_group.add_argument('-p', '--password',
+                                                   required=True,
+                                                   action=EnvDefault,
+                                                   envvar='BROCADE_API_PASS',
+                                                   help='Password to use when connecting to host, '
+                                                        'can also be set by env BROCADE_API_PASS')
+        
+            self._standard_args_group.add_argument('-s', '--sessionfile',
+                                                   required=False,
+                                                   action='store',
+                                                   help='Sessionfile to reduce user logins')
+
+            self._standard_args_group.add_argument('--api-perfdata',
+                                                   required=False,
+                                                   action='store_true',
+                                                   help='Add the time of the REST API phases as perfdata:\n'
+                                                        'api_connect_ms, api_login_ms, api_<endpoint>_ms,\n'
+                                                        'api_decode_ms, api_requests and api_bytes')
+
+            self._standard_args_group.add_argument('--show-plan',
+                                                   required=False,
+                                                   action='store_true',
+                                                   help='Print the REST requests of the check instead of running it')
+
+        self._standard_args_group.add_argument('--session-pool',
+                                               required=False,
                                                action='store',
-                                               help='Brocade device service address to connect to')
+                                               help='State directory of a session pool shared by all checks,\n'
+                                                    'replaces --sessionfile')
 
-        # because we want -p for password, we use -o for port
-        self._standard_args_group.add_argument('-P', '--port',
+        self._standard_args_group.add_argument('--session-pool-size',
+                                               required=False,
                                                type=int,
-                                               default=443,
+                                               default=1,
                                                action='store',
-                                               help='Port to connect on')
+                                               help='Maximum concurrent sessions per switch and user, default is 1')
 
-        self._standard_args_group.add_argument('-u', '--username',
-                                               required=True,
+        self._standard_args_group.add_argument('--session-pool-wait',
+                                               required=False,
+                                               type=int,
+                                               default=20,
                                                action='store',
-                                               help='API User name to use when connecting to host')
-
-        self._standard_args_group.add_argument('-p', '--password',
-                                               required=True,
-                                               action=EnvDefault,
-                                               envvar='BROCADE_API_PASS',
-                                               help='Password to use when connecting to host, '
-                                                    'can also be set by env BROCADE_API_PASS')
-        
-        self._standard_args_group.add_argument('-s', '--sessionfile',
+                                               help='Seconds to wait for a free session, default is 20')
+
+        self._standard_args_group.add_argument('--session-max-idle',
                                                required=False,
+                                               type=int,
+                                               default=600,
                                                action='store',
-                                               help='Sessionfile to reduce user logins')
-        
+                                               help='Use a token from the sessionfile without verification if it was\n'
+                                                    'used within these seconds, default is 600')
+
+        self._standard_args_group.add_argument('--cache-dir',
+                                               required=False,
+                                               action='store',
+                                               help='Directory to share API responses between checks')
+
+        self._standard_args_group.add_argument('--cache-ttl',
+                                               required=False,
+                                               action='store',
+                                               nargs='+',
+                                               default=['30'],
+                                               help='Seconds to keep cached responses, default is 30.\n'
+                                                    'Per endpoint with ENDPOINT=SECONDS e.g. brocade-chassis/chassis=300,\n'
+                                                    'use 0 to disable caching of an endpoint.\n'
+                                                    'brocade-interface/fibrechannel-statistics is not cached by default')
+
+        self._standard_args_group.add_argument('--circuit-breaker',
+                                               required=False,
+                                               action='store',
+                                               help='State directory of a circuit breaker per switch. After failed\n'
+                                                    'requests (connection errors, timeouts, 5xx) checks fail fast\n'
+                                                    'until a probe request succeeds')
+
+        self._standard_args_group.add_argument('--breaker-threshold',
+                                               required=False,
+                                               type=int,
+                                               default=5,
+                                               action='store',
+                                               help='Consecutive failed requests opening the breaker, default is 5')
+
+        self._standard_args_group.add_argument('--breaker-cooldown',
+                                               required=False,
+                                               type=int,
+                                               default=60,
+                                               action='store',
+                                               help='Seconds to fail fast before a probe request, default is 60')
+
         self._standard_args_group.add_argument('-nossl', '--disable-ssl-verification',
                                                required=False,
                                                action='store_true',
@@ -110,14 +215,20 @@ class Parser:
                                                 action='count',
                                                 help='Verbose output')
 
-    def get_args(self):
+    def get_args(self, argv=None):
         """
         Supports the command-line arguments needed to form a connection to Brocade.
+        argv defaults to sys.argv
         """
-        args = self._parser.parse_args()
-        x = self._parser.parse_known_args()
+        args = self._parser.parse_args(argv)
         return args
 
+    def standard_options(self):
+        """
+        Names of the standard arguments in the parsed namespace
+        """
+        return [action.dest for action in self._standard_args_group._group_actions]
+
     def _add_sample_specific_arguments(self, is_required: bool, *args):
         """
         Add an argument to the "sample specific arguments" group
@@ -163,6 +274,12 @@ class Parser:
         """
         self._parser.description = description
 
+    def set_prog(self, prog):
+        """
+        Program name in usage and errors, defaults to sys.argv[0]
+        """
+        self._parser.prog = prog
+
     def _prompt_for_password(self, args):
         """
         if no password is specified on the command line, prompt for it
@@ -202,6 +319,14 @@ class Argument:
         'name_or_flags': ['--include'],
         'options': {'action': 'store', 'help': 'Including items'}
     }
+    FILTER = {
+        'name_or_flags': ['--filter'],
+        'options': {
+            'action': 'store',
+            'help': "Filter expression on item fields, e.g. \"type=e-port and not name~^0/\"\n"
+                    "operators = != ~ !~, combined with and, or, not and ( )",
+        }
+    }
     UNIT = {
         'name_or_flags': ['-U', '--unit'],
         'options': {
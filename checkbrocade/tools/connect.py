@@ -15,35 +15,72 @@
 
 import requests
 import atexit
+import contextlib
+import fcntl
 import json
+import logging
 import re
 import os
-from typing import Optional, Dict, Any
-from checkbrocade import CheckBrocadeConnnectException
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+from checkbrocade import CheckBrocadeException, CheckBrocadeConnnectException, CheckBrocadeDeadline
+from . import cli
+from .breaker import CircuitBreaker
+from .cache import ResponseCache
+from .helper import atomic_write, iter_json_array
+from .plan import Plan, Endpoint
+from .timing import ApiTimer, endpoint_phase
 
 requests.packages.urllib3.disable_warnings()
 
 
 class broadcomAPI:
-    def __init__(self, logger, base_url: str, username: str, password: str, sessionfile: Optional[str] = None):
+    def __init__(self, logger, base_url: str, username: str, password: str, sessionfile: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, session_max_idle: int = 600,
+                 pool: Optional["SessionPool"] = None,
+                 deadline: Optional[float] = None, breaker: Optional[CircuitBreaker] = None):
         self.logger = logger
         self.base_url = base_url
         self.username = username
         self.password = password
         self.sessionfile = sessionfile
+        self.cache = cache
+        self.session_max_idle = session_max_idle
+        self.pool = pool
+        # time.monotonic() all requests have to be done by, see timeout()
+        self.deadline = deadline
         self.apiversion: Optional[str] = None
+        self.issued: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.max_workers = 4
+        # GET responses of this run, every endpoint is requested once
+        self.responses: Optional[Dict[Any, Any]] = {}
+        self._login_lock = threading.Lock()
+        self.timer = ApiTimer()
 
         self.session = requests.Session()
         self.session.verify = False
+        self.session.mount("https://", timed_adapter(self.timer, breaker))
+        self.session.mount("http://", timed_adapter(self.timer, breaker))
         self.session.headers.update({
             "Accept": "application/yang-data+json",
             "Content-Type": "application/yang-data+json",
         })
 
-        token = self.read_session_id()
-        if token:
+        stored = self.read_session()
+        if stored and self.session_is_fresh(stored):
+            # recently used token, a 401/403 in make_request will login again
+            self.logger.info(f"Using recently used token from {self.sessionfile} without verification")
+            self.session.headers["Authorization"] = stored['token']
+            self.apiversion = stored['apiversion']
+            self.issued = stored.get('issued')
+            self.last_used = stored.get('last_used')
+        elif stored:
             self.logger.info(f"Using existing token from {self.sessionfile}")
-            self.session.headers["Authorization"] = token
+            self.session.headers["Authorization"] = stored['token']
+            self.issued = stored.get('issued')
             if not self.verify_token():
                 self.logger.warning("Stored token is invalid. Logging in with username/password.")
                 self.login_with_password()
@@ -57,26 +94,80 @@ class broadcomAPI:
     # ---------------------------
     # Session Handling
     # ---------------------------
-    def write_session_id(self, token: str):
-        if self.sessionfile:
+    def write_session(self):
+        """ store the token with its metadata, readers never see a partial file """
+        token = self.session.headers.get("Authorization")
+        if self.sessionfile and token:
+            session = {
+                'token': token,
+                'issued': self.issued,
+                'apiversion': self.apiversion,
+                'last_used': self.last_used,
+            }
             try:
-                with open(self.sessionfile, "w") as f:
-                    self.logger.debug(f"Saving session to {self.sessionfile}")
-                    f.write(token)
+                self.logger.debug(f"Saving session to {self.sessionfile}")
+                atomic_write(self.sessionfile, json.dumps(session))
             except Exception as e:
                 self.logger.error(f"Failed to write session file: {e}")
 
-    def read_session_id(self) -> Optional[str]:
+    def read_session(self) -> Optional[Dict[str, Any]]:
         if not self.sessionfile:
             return None
         try:
             self.logger.debug(f"Reading session from {self.sessionfile}")
-            return open(self.sessionfile).read().strip()
+            content = open(self.sessionfile).read().strip()
         except FileNotFoundError:
             return None
         except Exception:
             self.logger.exception("Error restoring session")
             return None
+        if not content:
+            return None
+        try:
+            session = json.loads(content)
+        except ValueError:
+            # session file of older versions with just the token
+            return {'token': content}
+        if not isinstance(session, dict) or not session.get('token'):
+            return None
+        return session
+
+    @contextlib.contextmanager
+    def session_lock(self):
+        """ serialize logins of all processes sharing the sessionfile or pool """
+        if self.pool:
+            with self.pool.login_lock():
+                yield
+        elif self.sessionfile:
+            with open(f"{self.sessionfile}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        else:
+            yield
+
+    def adopt_session(self) -> bool:
+        """ take over a token another process got while we waited for the login lock """
+        stored = self.read_session()
+        if not stored or stored['token'] == self.session.headers.get("Authorization"):
+            return False
+        if not self.session_is_fresh(stored):
+            return False
+        self.logger.info(f"Using token of a concurrent login from {self.sessionfile}")
+        self.session.headers["Authorization"] = stored['token']
+        self.apiversion = stored['apiversion']
+        self.issued = stored.get('issued')
+        self.last_used = stored.get('last_used')
+        return True
+
+    def session_is_fresh(self, session: Dict[str, Any]) -> bool:
+        """ token was used successfully within session_max_idle seconds """
+        if not session.get('apiversion') or not session.get('last_used'):
+            return False
+        idle = time.time() - session['last_used']
+        return 0 <= idle < self.session_max_idle
 
     # ---------------------------
     # Token Verification & Login
@@ -85,16 +176,25 @@ class broadcomAPI:
         status_url = f"{self.base_url}/rest/running/brocade-chassis/chassis"
         self.logger.info("Verifying token")
         try:
-            response = self.session.get(status_url, timeout=(5, 5))
+            with self.timer.measure("verify"):
+                response = self.session.get(status_url, timeout=self.timeout("verify", 5))
+            self.timer.count(len(response.content))
             self.logger.debug(f"Verify URL {status_url} response with {response.status_code}")
             self.apiversion = response.headers.get("Content-Type")
 
             if response.status_code == 200:
+                self.last_used = time.time()
+                if self.responses is not None:
+                    self.responses[("rest/running/brocade-chassis/chassis", None)] = response.json().get("Response")
+                if self.cache:
+                    # the verify request already fetched the chassis, keep it
+                    self.cache.store(self.base_url, "rest/running/brocade-chassis/chassis", None,
+                                     response.json().get("Response"))
                 return True
             elif response.status_code in (401, 403):
                 self.logger.warning("Stored token invalid or expired. Re-login required.")
                 self.login_with_password()
-                response = self.session.get(status_url, timeout=(5, 5))
+                response = self.session.get(status_url, timeout=self.timeout("verify", 5))
                 self.logger.debug(f"Verify after re-login response: {response.status_code}")
                 return response.status_code == 200
             else:
@@ -104,11 +204,24 @@ class broadcomAPI:
         return False
 
     def login_with_password(self):
+        with self.session_lock():
+            if self.adopt_session():
+                return
+            self._login_with_password()
+
+    def _login_with_password(self):
         self.logger.info(f"Login with user/password to {self.base_url}")
         login_url = f"{self.base_url}/rest/login"
         try:
-            response = self.session.post(login_url, auth=(self.username, self.password), timeout=(5, 5))
+            with self.timer.measure("login"):
+                response = self.session.post(login_url, auth=(self.username, self.password),
+                                             timeout=self.timeout("login", 5))
+            self.timer.count(len(response.content))
             response.raise_for_status()
+        except requests.Timeout as e:
+            self.expired("login", e)
+            self.logger.error(f"Login request failed: {e}")
+            raise
         except requests.RequestException as e:
             self.logger.error(f"Login request failed: {e}")
             raise
@@ -118,9 +231,11 @@ class broadcomAPI:
 
         if token:
             self.logger.info("Password login successful")
-            if self.sessionfile:
-                self.write_session_id(token)
             self.session.headers["Authorization"] = token
+            self.issued = time.time()
+            self.last_used = self.issued
+            if self.sessionfile:
+                self.write_session()
             self.logger.debug(
                 f"For manual logout use:\ncurl -kv -X POST -H 'Authorization: {token}' "
                 f"-H 'Accept: application/yang-data+json' '{self.base_url}/rest/logout'"
@@ -135,52 +250,121 @@ class broadcomAPI:
         self.logger.info("Logging out...")
         logout_url = f"{self.base_url}/rest/logout"
         try:
-            response = self.session.post(logout_url)
+            response = self.session.post(logout_url, timeout=5)
             if response.status_code == 204:
                 self.logger.info("Logout successful")
+                self.last_used = None
                 if self.sessionfile and os.path.exists(self.sessionfile):
                     os.remove(self.sessionfile)
             else:
                 self.logger.warning(f"Logout failed with status: {response.status_code}")
-        except requests.RequestException as e:
+        except (requests.RequestException, CheckBrocadeConnnectException) as e:
             self.logger.error(f"Logout request failed: {e}")
         finally:
             self.session.close()
 
     def cleanup(self):
+        if self.sessionfile and self.last_used and os.path.exists(self.sessionfile):
+            # remember the last successful use for the next invocation
+            self.write_session()
         if self.session:
             self.logger.info("Closing session")
             self.session.close()
+        if self.pool:
+            self.pool.release()
+
+    def relogin(self, stale_token: Optional[str]) -> bool:
+        """
+        Re-authenticate after a 401/403. Only one thread logs in, the others
+        find a new token in the session headers and just retry with it.
+        """
+        with self._login_lock:
+            if self.session.headers.get("Authorization") != stale_token:
+                self.logger.debug("Token already renewed by another request")
+                return True
+            self.login_with_password()
+            return self.session.headers.get("Authorization") != stale_token
+
+    # ---------------------------
+    # Deadline
+    # ---------------------------
+    def timeout(self, endpoint: str, limit: Optional[float] = None) -> Optional[float]:
+        """
+        timeout of a request, the rest of the run budget (at most limit).
+        Raises CheckBrocadeDeadline if the budget is used up.
+        """
+        if self.deadline is None:
+            return limit
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise CheckBrocadeDeadline(f"deadline reached, {endpoint} skipped")
+        return min(remaining, limit) if limit else remaining
+
+    def expired(self, endpoint: str, error: Exception):
+        """ raise CheckBrocadeDeadline if error is a timeout because the budget is used up """
+        if self.deadline is not None and time.monotonic() >= self.deadline - 0.5:
+            self.logger.error(f"deadline reached during {endpoint}: {error}")
+            raise CheckBrocadeDeadline(f"deadline reached, {endpoint} skipped") from error
 
     # ---------------------------
     # Requests with Automatic Retry
     # ---------------------------
     def make_request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None,
                      params: Optional[Dict[str, Any]] = None):
+        if self.responses is not None and method == "GET" and data is None:
+            key = (endpoint, json.dumps(params, sort_keys=True) if params else None)
+            if key in self.responses:
+                self.logger.debug(f"Reusing response of {endpoint}")
+                return self.responses[key]
+            self.responses[key] = self._cached_request(method, endpoint, data, params)
+            return self.responses[key]
+        return self._cached_request(method, endpoint, data, params)
+
+    def _cached_request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None,
+                        params: Optional[Dict[str, Any]] = None):
+        if self.cache and method == "GET" and data is None:
+            return self.cache.fetch(self.base_url, endpoint, params,
+                                    lambda: self._request(method, endpoint, data, params))
+        return self._request(method, endpoint, data, params)
+
+    def _request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None,
+                 params: Optional[Dict[str, Any]] = None):
         url = f"{self.base_url}/{endpoint}"
         self.logger.info(f"Making {method} request to {url}")
 
         for attempt in range(2):  # max 2 attempts
             try:
-                response = self.session.request(method, url, json=data, params=params)
+                token = self.session.headers.get("Authorization")
+                timeout = self.timeout(endpoint)
+                with self.timer.measure(endpoint_phase(endpoint)):
+                    response = self.session.request(method, url, json=data, params=params, timeout=timeout)
+                self.timer.count(len(response.content))
 
                 if response.status_code == 400:
                     self.logger.error(f"Bad request (400) to {url}. Aborting.")
                     response.raise_for_status()
 
                 if response.status_code in (401, 403):
-                    self.logger.warning("Unauthorized (401/403). Verifying token and re-login if needed...")
-                    if not self.verify_token():
+                    self.logger.warning("Unauthorized (401/403). Re-login...")
+                    if not self.relogin(token):
                         self.logger.error("Re-login failed during request retry.")
                         self.logout()
                         response.raise_for_status()
                     continue  # retry after re-login
 
                 response.raise_for_status()
-                r_dict = response.json()
-                self.logger.debug(f"{json.dumps(r_dict, indent=4, sort_keys=True)}")
+                self.last_used = time.time()
+                with self.timer.measure("decode"):
+                    r_dict = response.json()
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug(f"{json.dumps(r_dict, indent=4, sort_keys=True)}")
                 return r_dict.get("Response")
 
+            except requests.Timeout as e:
+                self.expired(endpoint, e)
+                self.logger.error(f"Request to {url} failed: {e}")
+                if attempt == 1:
+                    raise
             except requests.RequestException as e:
                 self.logger.error(f"Request to {url} failed: {e}")
                 if attempt == 1:
@@ -189,6 +373,113 @@ class broadcomAPI:
             except json.JSONDecodeError as e:
                 self.logger.error(f"JSON decode error: {e}")
                 raise
+        raise CheckBrocadeException(f"{method} {endpoint} still unauthorized after re-login")
+
+    def stream_request(self, endpoint: str, key: str, params: Optional[Dict[str, Any]] = None):
+        """
+        GET endpoint and yield the items of the array key (e.g. fibrechannel)
+        one at a time while the response is received. Memory use depends on
+        the size of one item instead of the whole response.
+        The response cache and shared responses are not used.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        self.logger.info(f"Making streaming GET request to {url}")
+        phase = endpoint_phase(endpoint)
+
+        for attempt in range(2):  # max 2 attempts
+            token = self.session.headers.get("Authorization")
+            try:
+                timeout = self.timeout(endpoint)
+                with self.timer.measure(phase):
+                    response = self.session.get(url, params=params, stream=True, timeout=timeout)
+                self.timer.count()
+            except requests.RequestException as e:
+                if isinstance(e, requests.Timeout):
+                    self.expired(endpoint, e)
+                self.logger.error(f"Request to {url} failed: {e}")
+                if attempt == 1:
+                    raise
+                continue
+
+            with response:
+                if response.status_code in (401, 403):
+                    self.logger.warning("Unauthorized (401/403). Re-login...")
+                    if not self.relogin(token):
+                        self.logger.error("Re-login failed during request retry.")
+                        response.raise_for_status()
+                    continue  # retry after re-login
+
+                response.raise_for_status()
+                self.last_used = time.time()
+                debug = self.logger.isEnabledFor(logging.DEBUG)
+                chunks = self.timed_chunks(response.iter_content(chunk_size=65536), phase)
+                try:
+                    for item in iter_json_array(chunks, key):
+                        if debug:
+                            self.logger.debug(f"{json.dumps(item, sort_keys=True)}")
+                        yield item
+                except requests.RequestException as e:
+                    # a read timeout while receiving the chunks
+                    self.expired(endpoint, e)
+                    raise
+                return
+        raise CheckBrocadeException(f"GET {endpoint} still unauthorized after re-login")
+
+    def memoized(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        """ the response of endpoint is already known in this run """
+        key = (endpoint, json.dumps(params, sort_keys=True) if params else None)
+        return self.responses is not None and key in self.responses
+
+    def plan(self, endpoints: List[Endpoint]) -> Plan:
+        """ plan the requests of a check, see tools.plan """
+        return Plan(self, endpoints)
+
+    def timed_chunks(self, chunks, phase: str):
+        """ chunks of a streamed response, receiving them counts for the endpoint """
+        chunks = iter(chunks)
+        while True:
+            with self.timer.measure(phase):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self.timer.received(len(chunk))
+            yield chunk
+
+    def fetch_many(self, endpoints: List[str], max_workers: Optional[int] = None,
+                   return_exceptions: bool = False) -> Dict[str, Any]:
+        """
+        GET several endpoints concurrently over the shared session.
+        Returns a dict endpoint -> response in the order of endpoints.
+        With return_exceptions a failed endpoint maps to its exception,
+        otherwise the first failure is raised once all requests are done.
+        """
+        endpoints = list(dict.fromkeys(endpoints))
+        workers = min(max_workers or self.max_workers, len(endpoints))
+        if workers <= 1:
+            results = {}
+            for endpoint in endpoints:
+                try:
+                    results[endpoint] = self.make_request("GET", endpoint)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[endpoint] = e
+            return results
+
+        self.logger.info(f"Fetching {len(endpoints)} endpoints with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {endpoint: executor.submit(self.make_request, "GET", endpoint) for endpoint in endpoints}
+
+        results = {}
+        for endpoint, future in futures.items():
+            e = future.exception()
+            if e is None:
+                results[endpoint] = future.result()
+            elif return_exceptions:
+                results[endpoint] = e
+            else:
+                raise e
+        return results
 
     # ---------------------------
     # Version Mapping
@@ -208,3 +499,249 @@ class broadcomAPI:
             return FabricOS.get(version, version) if fabric else version
         return "unknown"
 
+    def virtual_fabrics(self, endpoint: str, chassis: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        endpoint per virtual fabric with ports, {'novf': endpoint} if VF is not enabled.
+        chassis is the brocade-chassis/chassis dict if already fetched.
+        """
+        if chassis is None:
+            chassis = self.make_request("GET", "rest/running/brocade-chassis/chassis")['chassis']
+        if not chassis.get('vf-enabled'):
+            self.logger.info(f"NO VF go ahead")
+            return {'novf': endpoint}
+
+        self.logger.info(f"VF Found checking for IDs")
+        s = self.make_request("GET", "rest/running/brocade-fibrechannel-logical-switch/fibrechannel-logical-switch")
+        separator = '&' if '?' in endpoint else '?'
+        endpoints = {}
+        for vf in s['fibrechannel-logical-switch']:
+            if len(vf['port-index-members']) != 0:
+                self.logger.info(f"get {endpoint} for virtual fabric {vf['fabric-id']}")
+                endpoints[str(vf['fabric-id'])] = f"{endpoint}{separator}vf-id={vf['fabric-id']}"
+            else:
+                self.logger.debug(f"Fabric-ID {vf['fabric-id']} has no ports")
+        return endpoints
+
+
+def timed_adapter(timer: ApiTimer, breaker: Optional[CircuitBreaker] = None):
+    """
+    HTTPAdapter whose connections add the time of connect (TCP and TLS
+    handshake) to timer, new connections only, kept alive ones cost nothing.
+    With a breaker every request reports its result to the circuit breaker
+    and fails fast while the breaker is open.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def timed(connection_class):
+        class TimedConnection(connection_class):
+            def connect(self):
+                with timer.measure("connect"):
+                    return super().connect()
+        return TimedConnection
+
+    class TimedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': type("TimedHTTPConnectionPool", (HTTPConnectionPool,),
+                             {'ConnectionCls': timed(HTTPConnection)}),
+                'https': type("TimedHTTPSConnectionPool", (HTTPSConnectionPool,),
+                              {'ConnectionCls': timed(HTTPSConnection)}),
+            }
+
+        def send(self, request, **kwargs):
+            if breaker is None:
+                return super().send(request, **kwargs)
+            probe = breaker.allow()
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.failure(probe, f"{e}")
+                raise
+            except BaseException:
+                breaker.release(probe)
+                raise
+            if response.status_code >= 500:
+                breaker.failure(probe, f"HTTP {response.status_code} for {request.path_url}")
+            else:
+                breaker.success(probe)
+            return response
+
+    return TimedAdapter()
+
+
+class SessionPool:
+    """
+    Pool of REST sessions per switch and user shared by all processes on
+    this host.
+
+    FOS limits the number of concurrent REST sessions. The pool keeps at most
+    size tokens per switch and user in a state directory, a token is never
+    used with the credentials of another user. Every process leases one slot
+    (an exclusive flock on the slot) and uses the slot file as its sessionfile.
+    Processes over the limit wait for a free slot instead of opening another
+    session, and logins for the switch are serialized by a host wide lock.
+
+    Example:
+        pool = SessionPool(logger, "/var/tmp/check_brocade", "monitor@switch01:443", size=2)
+        api = broadcomAPI(logger, base_url, username, password, pool.lease(), pool=pool)
+    """
+
+    def __init__(self, logger, directory: str, host: str, size: int = 1, wait: int = 20):
+        self.logger = logger
+        self.directory = directory
+        self.name = re.sub(r'[^\w.-]', '_', host)
+        self.size = max(1, size)
+        self.wait = wait
+        self._lease = None
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def slot(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{index}.session")
+
+    def lease(self) -> str:
+        """ lease a free slot and return its session file, wait if all are in use """
+        deadline = time.monotonic() + self.wait
+        # different processes start searching at different slots
+        first = os.getpid() % self.size
+        while True:
+            for i in range(self.size):
+                index = (first + i) % self.size
+                lock = open(f"{self.slot(index)}.lease", "a")
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock.close()
+                    continue
+                self._lease = lock
+                self.logger.info(f"Leased session slot {index} of {self.size} for {self.name}")
+                return self.slot(index)
+            if time.monotonic() >= deadline:
+                raise CheckBrocadeConnnectException(
+                    f"all {self.size} sessions to {self.name} are in use, waited {self.wait}s")
+            self.logger.debug(f"all {self.size} session slots for {self.name} in use, waiting")
+            time.sleep(0.1)
+
+    def release(self):
+        if self._lease:
+            fcntl.flock(self._lease, fcntl.LOCK_UN)
+            self._lease.close()
+            self._lease = None
+
+    @contextlib.contextmanager
+    def login_lock(self):
+        with open(os.path.join(self.directory, f"{self.name}.login.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+_shared_apis: Optional[Dict[Any, broadcomAPI]] = None
+
+
+@contextlib.contextmanager
+def shared_session():
+    """
+    Within this context api_from_args returns one broadcomAPI per switch,
+    so several checks share the login and every fetched endpoint.
+    """
+    global _shared_apis
+    _shared_apis = {}
+    try:
+        yield _shared_apis
+    finally:
+        for api in _shared_apis.values():
+            api.responses = None
+            api.cleanup()
+            atexit.unregister(api.cleanup)
+        _shared_apis = None
+
+
+_kept_apis: Optional[Dict[Any, broadcomAPI]] = None
+_kept_locks: Dict[Any, threading.RLock] = {}
+_kept_lock = threading.Lock()
+
+
+def keep_sessions() -> Dict[Any, broadcomAPI]:
+    """
+    From now on api_from_args keeps one broadcomAPI per switch and user for
+    the life of the process, with its token and keep-alive connections.
+    Used by the worker, thread safe. Returns the kept APIs.
+    """
+    global _kept_apis
+    if _kept_apis is None:
+        _kept_apis = {}
+    return _kept_apis
+
+
+def session_key(args):
+    """ key of the kept and shared APIs """
+    return (f"https://{args.host}:{args.port}", args.username)
+
+
+def session_lock(key) -> threading.RLock:
+    """
+    lock of the kept API of key. A run holding it for its whole duration
+    has the deadline and responses of the API for itself.
+    """
+    with _kept_lock:
+        return _kept_locks.setdefault(key, threading.RLock())
+
+
+def api_from_args(logger, args) -> broadcomAPI:
+    """ create the API connection from the standard command line arguments """
+    key = session_key(args)
+    base_url = key[0]
+    if _shared_apis is not None:
+        if key not in _shared_apis:
+            _shared_apis[key] = _api_from_args(logger, args, base_url)
+        _shared_apis[key].deadline = cli.deadline()
+        return _shared_apis[key]
+    if _kept_apis is not None:
+        # a slow switch only blocks checks of the same switch
+        with session_lock(key):
+            api = _kept_apis.get(key)
+            if api is None or api.password != args.password:
+                api = _kept_apis[key] = _api_from_args(logger, args, base_url)
+            else:
+                # the responses of earlier runs are outdated
+                api.responses = {}
+        api.logger = logger
+        # the budget of the latest run, the worker enforces the timeout of each run
+        api.deadline = cli.deadline()
+        return api
+    return _api_from_args(logger, args, base_url)
+
+
+def persistent_api(logger, args, deadline: Optional[float] = None) -> broadcomAPI:
+    """
+    A broadcomAPI for the life of the caller, e.g. a poller of the exporter.
+    It is neither shared nor kept, the caller sets api.deadline before every
+    use, deadline is the one of the login.
+    """
+    return _api_from_args(logger, args, f"https://{args.host}:{args.port}", deadline)
+
+
+def _api_from_args(logger, args, base_url: str, deadline: Optional[float] = None) -> broadcomAPI:
+    sessionfile = args.sessionfile
+    pool = None
+    if getattr(args, 'session_pool', None):
+        pool = SessionPool(logger, args.session_pool, f"{args.username}@{args.host}:{args.port}",
+                           args.session_pool_size, args.session_pool_wait)
+        sessionfile = pool.lease()
+    try:
+        return broadcomAPI(logger, base_url, args.username, args.password, sessionfile,
+                           cache=ResponseCache.from_args(logger, args),
+                           session_max_idle=args.session_max_idle,
+                           pool=pool,
+                           deadline=deadline if deadline is not None else cli.deadline(),
+                           breaker=CircuitBreaker.from_args(logger, args))
+    except BaseException:
+        # the cleanup of the API releases the slot, it is not registered yet
+        if pool is not None:
+            pool.release()
+        raise
@@ -0,0 +1,141 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import struct
+import tempfile
+import zlib
+from array import array
+from typing import List, Optional
+from .helper import atomic_write
+
+MAGIC = b"CBCS"
+VERSION = 1
+# magic, version, fields, fields checksum, records
+HEADER = struct.Struct("<4sHHII")
+NAME_SIZE = 32
+
+
+def counter_delta(previous: int, current: int) -> Optional[int]:
+    """
+    increase of a counter since the previous sample, None if it went down.
+    The REST API delivers the counters as 64 bit values, a counter that
+    went down was reset (e.g. portstatsclear) and the time of the reset
+    is unknown, so there is no rate until the next sample.
+    """
+    if current >= previous:
+        return current - previous
+    return None
+
+
+def state_path(directory: Optional[str], host: str, name: str) -> str:
+    directory = directory or tempfile.gettempdir()
+    host = re.sub(r'[^\w.-]', '_', host)
+    return os.path.join(directory, f"check_brocade_{host}_{name}.state")
+
+
+class CounterState:
+    """
+    Previous counter samples per port in a compact binary file.
+
+    The file holds fixed width records (port name, sample time and one
+    unsigned 64 bit value per field). In memory the records stay in arrays
+    with a dict as index by port name.
+
+    Example:
+        state = CounterState(path, ['crc-errors', 'link-failures'])
+        state.load()
+        rates = state.rates("128:1/0", now, [12, 0])  # None on the first sample
+        state.save()
+    """
+
+    def __init__(self, path: str, fields: List[str]):
+        self.path = path
+        self.fields = list(fields)
+        self.record = struct.Struct(f"<{NAME_SIZE}sd{len(self.fields)}Q")
+        self.checksum = zlib.crc32(",".join(self.fields).encode())
+        self.names = []
+        self.times = array('d')
+        self.values = array('Q')
+        self.index = {}
+
+    def load(self) -> bool:
+        """ False if there is no usable state, e.g. on the first run """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        if len(data) < HEADER.size:
+            return False
+        magic, version, count, checksum, records = HEADER.unpack_from(data)
+        if (magic, version, count, checksum) != (MAGIC, VERSION, len(self.fields), self.checksum):
+            # other format or fields, start over
+            return False
+        if len(data) != HEADER.size + records * self.record.size:
+            return False
+        for i, (name, timestamp, *values) in enumerate(self.record.iter_unpack(data[HEADER.size:])):
+            name = name.rstrip(b"\0").decode()
+            self.index[name] = i
+            self.names.append(name)
+            self.times.append(timestamp)
+            self.values.extend(values)
+        return True
+
+    def previous(self, name: str):
+        """ (timestamp, values) of the previous sample or None """
+        i = self.index.get(name)
+        if i is None:
+            return None
+        k = len(self.fields)
+        return (self.times[i], self.values[i * k:(i + 1) * k])
+
+    def update(self, name: str, timestamp: float, values) -> None:
+        k = len(self.fields)
+        values = [min(max(int(v), 0), 2**64 - 1) for v in values]
+        i = self.index.get(name)
+        if i is None:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+            self.times.append(timestamp)
+            self.values.extend(values)
+        else:
+            self.times[i] = timestamp
+            self.values[i * k:(i + 1) * k] = array('Q', values)
+
+    def rates(self, name: str, timestamp: float, values):
+        """
+        per second rates since the previous sample and store the new sample.
+        None for a new port or if no time passed, the rate of a counter
+        that was reset is None.
+        """
+        previous = self.previous(name)
+        self.update(name, timestamp, values)
+        if previous is None:
+            return None
+        elapsed = timestamp - previous[0]
+        if elapsed <= 0:
+            return None
+        deltas = [counter_delta(p, int(v)) for p, v in zip(previous[1], values)]
+        return [None if d is None else d / elapsed for d in deltas]
+
+    def save(self) -> None:
+        k = len(self.fields)
+        parts = [HEADER.pack(MAGIC, VERSION, k, self.checksum, len(self.names))]
+        for i, name in enumerate(self.names):
+            parts.append(self.record.pack(name.encode()[:NAME_SIZE], self.times[i], *self.values[i * k:(i + 1) * k]))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        atomic_write(self.path, b"".join(parts))
@@ -0,0 +1,356 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Exporter mode, metrics of the switches of an inventory for Prometheus.
+
+    check_brocade exporter --inventory switches.ini --listen :9711
+
+Every switch has a poller thread with one long-lived API session. It polls
+on its own schedule, interval seconds with jitter, the first polls are
+spread over one interval. A poll renders the metrics of the switch into
+the cache and GET /metrics serves the cache, a scrape never makes a
+request to a switch.
+"""
+
+import argparse
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from .classify import classifier_for, is_director
+from .plan import Endpoint, fos_min
+from .porttable import PortTable
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+ENDPOINTS = [
+    Endpoint('chassis', "rest/running/brocade-chassis/chassis"),
+    Endpoint('blade', "rest/running/brocade-fru/blade"),
+    Endpoint('fan', "rest/running/brocade-fru/fan"),
+    Endpoint('power', "rest/running/brocade-fru/power-supply"),
+    # older FOS has no usable sensor endpoint
+    Endpoint('sensor', "rest/running/brocade-fru/sensor", when=fos_min("9.0.0")),
+    Endpoint('fibrechannel', "rest/running/brocade-interface/fibrechannel", per_vf=True),
+    Endpoint('statistics', "rest/running/brocade-interface/fibrechannel-statistics", per_vf=True),
+]
+
+# counters of fibrechannel-statistics
+STATISTICS = [
+    ("in-octets", "brocade_port_received_bytes_total", "Bytes received"),
+    ("out-octets", "brocade_port_transmitted_bytes_total", "Bytes transmitted"),
+    ("in-frames", "brocade_port_received_frames_total", "Frames received"),
+    ("out-frames", "brocade_port_transmitted_frames_total", "Frames transmitted"),
+    ("crc-errors", "brocade_port_crc_errors_total", "Frames with CRC errors"),
+    ("link-failures", "brocade_port_link_failures_total", "Link failures"),
+    ("loss-of-sync", "brocade_port_loss_of_sync_total", "Losses of synchronization"),
+    ("loss-of-signal", "brocade_port_loss_of_signal_total", "Losses of signal"),
+    ("invalid-transmission-words", "brocade_port_invalid_transmission_words_total", "Invalid transmission words"),
+]
+
+# metric families in the order of /metrics: name, type, help
+FAMILIES = [
+    ("brocade_up", "gauge", "1 if the last poll of the switch succeeded"),
+    ("brocade_poll_duration_seconds", "gauge", "Duration of the last poll"),
+    ("brocade_poll_success_timestamp_seconds", "gauge", "Time of the last successful poll, the age of the data"),
+    ("brocade_poll_errors_total", "counter", "Failed polls"),
+    ("brocade_api_requests_total", "counter", "REST requests to the switch"),
+    ("brocade_api_received_bytes_total", "counter", "Bytes of the REST responses"),
+    ("brocade_chassis_info", "gauge", "Name, product and serial number of the chassis"),
+    ("brocade_uptime_seconds", "gauge", "Uptime of the switch"),
+    ("brocade_blade_up", "gauge", "1 if the blade is enabled"),
+    ("brocade_fan_up", "gauge", "1 if the operational state of the fan is ok"),
+    ("brocade_fan_speed_rpm", "gauge", "Speed of the fan"),
+    ("brocade_power_supply_up", "gauge", "1 if the operational state of the power supply is ok"),
+    ("brocade_power_supply_input_volts", "gauge", "Input voltage of the power supply"),
+    ("brocade_power_supply_temperature_celsius", "gauge", "Temperature of the power supply"),
+    ("brocade_sensor_temperature_celsius", "gauge", "Temperature of the sensor"),
+    ("brocade_port_info", "gauge", "Alias and type of the port"),
+    ("brocade_port_up", "gauge", "1 if the port is online"),
+    ("brocade_port_enabled", "gauge", "1 if the port is enabled"),
+    ("brocade_port_speed_bps", "gauge", "Negotiated speed of the port in bit/s"),
+] + [(metric, "counter", text) for _, metric, text in STATISTICS]
+
+# families rendered from the responses of an endpoint, kept if it was skipped
+ENDPOINT_FAMILIES = {
+    'chassis': ["brocade_chassis_info", "brocade_uptime_seconds"],
+    'blade': ["brocade_blade_up"],
+    'fan': ["brocade_fan_up", "brocade_fan_speed_rpm"],
+    'power': ["brocade_power_supply_up", "brocade_power_supply_input_volts",
+              "brocade_power_supply_temperature_celsius"],
+    'sensor': ["brocade_sensor_temperature_celsius"],
+    'fibrechannel': ["brocade_port_info", "brocade_port_up", "brocade_port_enabled", "brocade_port_speed_bps"],
+    'statistics': [metric for _, metric, _ in STATISTICS],
+}
+
+
+def label_value(value: Any) -> str:
+    """ escaped for the text format """
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def labels(**values) -> str:
+    return ",".join(f'{name}="{label_value(value)}"' for name, value in values.items())
+
+
+class Samples:
+    """ sample lines of one switch per family, joined into a block each """
+
+    def __init__(self, switch: str):
+        self.switch = f'switch="{label_value(switch)}"'
+        self.lines: Dict[str, List[str]] = {}
+
+    def add(self, family: str, value, extra: str = ""):
+        if value is None:
+            return
+        if isinstance(value, bool):
+            value = int(value)
+        label = f"{self.switch},{extra}" if extra else self.switch
+        self.lines.setdefault(family, []).append(f"{family}{{{label}}} {value}\n")
+
+    def blocks(self) -> Dict[str, str]:
+        return {family: "".join(lines) for family, lines in self.lines.items()}
+
+
+def render(samples: Samples, response: Dict[str, Any], version: str):
+    """ samples of the responses of one poll """
+    if 'chassis' in response:
+        chassis = response['chassis']['chassis']
+        samples.add("brocade_chassis_info", 1, labels(
+            name=chassis.get('chassis-user-friendly-name', ''),
+            product=chassis.get('product-name', ''),
+            serial=chassis.get('vendor-serial-number', '')))
+        samples.add("brocade_uptime_seconds", chassis.get('system-uptime'))
+
+    for blade in (response.get('blade') or {}).get('blade', []):
+        if 'vacant' in blade.get('blade-state', ''):
+            continue
+        samples.add("brocade_blade_up", 'enabled' in blade.get('blade-state', ''),
+                    labels(slot=blade['slot-number'], type=blade.get('blade-type', 'unknown')))
+
+    for fan in (response.get('fan') or {}).get('fan', []):
+        unit = labels(unit=fan['unit-number'])
+        samples.add("brocade_fan_up", 'ok' in fan.get('operational-state', ''), unit)
+        samples.add("brocade_fan_speed_rpm", fan.get('speed'), unit)
+
+    for power in (response.get('power') or {}).get('power-supply', []):
+        unit = labels(unit=power['unit-number'])
+        samples.add("brocade_power_supply_up", 'ok' in power.get('operational-state', ''), unit)
+        if power.get('input-voltage', -1) != -1:
+            samples.add("brocade_power_supply_input_volts", power['input-voltage'], unit)
+        if power.get('temperature-sensor-supported') and 'sensor' in response:
+            samples.add("brocade_power_supply_temperature_celsius", power.get('temperature'), unit)
+
+    for sensor in (response.get('sensor') or {}).get('sensor', []):
+        if 'absent' in sensor.get('state', '') or sensor.get('category') != 'temperature':
+            continue
+        samples.add("brocade_sensor_temperature_celsius", sensor.get('temperature'), labels(id=sensor['id']))
+
+    classifier = None
+    if 'chassis' in response:
+        classifier = classifier_for(version, is_director(response['chassis']['chassis']))
+    for vf,fibrechannel in (response.get('fibrechannel') or {}).items():
+        vf = '' if vf == 'novf' else vf
+        table = PortTable(fibrechannel['fibrechannel'])
+        if classifier:
+            table.classify(classifier)
+        for row in range(len(table)):
+            port = labels(vf=vf, port=table.name[row])
+            if classifier:
+                samples.add("brocade_port_info", 1, f"{port},{labels(alias=table.alias[row], type=table.if_type[row])}")
+                samples.add("brocade_port_up", table.oper_state[row].lower().startswith("online"), port)
+            samples.add("brocade_port_enabled", table.enabled[row], port)
+            samples.add("brocade_port_speed_bps", table.speed[row], port)
+
+    for vf,statistics in (response.get('statistics') or {}).items():
+        vf = '' if vf == 'novf' else vf
+        for stats in statistics['fibrechannel-statistics']:
+            port = labels(vf=vf, port=stats['name'])
+            for counter, metric, _ in STATISTICS:
+                samples.add(metric, stats.get(counter), port)
+
+
+class MetricsCache:
+    """
+    Rendered metric blocks per switch and family. An update replaces the
+    blocks of one switch, the page is joined at most once per update and
+    served as is until the next one.
+    """
+
+    def __init__(self):
+        self.blocks: Dict[str, Dict[str, str]] = {}
+        self.lock = threading.Lock()
+        self._page: Optional[bytes] = None
+
+    def get(self, switch: str) -> Dict[str, str]:
+        with self.lock:
+            return dict(self.blocks.get(switch, {}))
+
+    def update(self, switch: str, blocks: Dict[str, str]):
+        with self.lock:
+            self.blocks[switch] = blocks
+            self._page = None
+
+    def page(self) -> bytes:
+        with self.lock:
+            if self._page is None:
+                parts = []
+                for family, kind, text in FAMILIES:
+                    samples = [blocks[family] for blocks in self.blocks.values() if family in blocks]
+                    if samples:
+                        parts.append(f"# HELP {family} {text}\n# TYPE {family} {kind}\n")
+                        parts.extend(samples)
+                self._page = "".join(parts).encode()
+            return self._page
+
+
+class Poller(threading.Thread):
+    """
+    Polls one switch every interval seconds (+- jitter) with one broadcomAPI
+    for the life of the exporter. Families of endpoints skipped at the
+    deadline or of a failed poll keep their previous samples, brocade_up
+    and brocade_poll_success_timestamp_seconds tell how current they are.
+    """
+
+    def __init__(self, logger, entry: Dict[str, Any], options: argparse.Namespace, cache: MetricsCache,
+                 semaphore: threading.Semaphore, stopped: threading.Event):
+        super().__init__(name=f"poll-{entry['name']}", daemon=True)
+        self.logger = logger
+        self.switch = entry['name']
+        self.cache = cache
+        self.semaphore = semaphore
+        self.stopped = stopped
+        self.interval = options.interval
+        self.jitter = options.jitter
+        self.timeout = options.poll_timeout
+        self.args = argparse.Namespace(**vars(options))
+        self.args.host = entry['host']
+        self.args.port = entry['port']
+        self.args.username = entry['username']
+        self.args.password = entry['password']
+        self.args.sessionfile = None
+        self.api = None
+        self.errors = 0
+        self.success = None
+
+    def run(self):
+        # the first polls of all switches are spread over one interval
+        delay = random.uniform(0, self.interval)
+        while not self.stopped.wait(delay):
+            start = time.monotonic()
+            with self.semaphore:
+                self.poll()
+            interval = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            delay = max(interval - (time.monotonic() - start), 0)
+
+    def poll(self):
+        from .connect import persistent_api
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        blocks = self.cache.get(self.switch)
+        samples = Samples(self.switch)
+        up = False
+        try:
+            if self.api is None:
+                self.api = persistent_api(self.logger, self.args, deadline)
+            self.api.deadline = deadline
+            # the responses of the previous poll are outdated
+            self.api.responses = {}
+            plan = self.api.plan(ENDPOINTS)
+            response = plan.fetch(return_exceptions=True)
+            render(samples, response, self.api.version(True))
+            # rendered families replace the previous ones, skipped ones are kept
+            for name, families in ENDPOINT_FAMILIES.items():
+                if response.get(name):
+                    for family in families:
+                        blocks.pop(family, None)
+            up = not plan.skipped
+            if plan.skipped:
+                self.logger.warning(f"{self.switch}: deadline reached, skipped {', '.join(plan.skipped)}")
+        except Exception as e:
+            self.logger.error(f"{self.switch}: poll failed: {e}")
+        if up:
+            self.success = time.time()
+        else:
+            self.errors += 1
+        samples.add("brocade_up", up)
+        samples.add("brocade_poll_duration_seconds", round(time.monotonic() - start, 3))
+        samples.add("brocade_poll_success_timestamp_seconds", self.success and round(self.success, 3))
+        samples.add("brocade_poll_errors_total", self.errors)
+        if self.api is not None:
+            samples.add("brocade_api_requests_total", self.api.timer.requests)
+            samples.add("brocade_api_received_bytes_total", self.api.timer.bytes)
+        blocks.update(samples.blocks())
+        self.cache.update(self.switch, blocks)
+        self.logger.info(f"{self.switch}: polled in {time.monotonic() - start:.2f}s")
+
+
+class Exporter:
+    """
+    Pollers of the switches of an inventory and the HTTP server of the cache.
+
+    Example:
+        exporter = Exporter(logger, read_inventory(path), options)
+        exporter.serve(":9711")
+    """
+
+    def __init__(self, logger, inventory: List[Dict[str, Any]], options: argparse.Namespace):
+        self.logger = logger
+        self.cache = MetricsCache()
+        self.stopped = threading.Event()
+        semaphore = threading.Semaphore(options.concurrency)
+        self.pollers = [Poller(logger, entry, options, self.cache, semaphore, self.stopped) for entry in inventory]
+
+    def serve(self, address: str):
+        """ serve /metrics on host:port until SIGTERM / SIGINT """
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+
+        cache = self.cache
+        logger = self.logger
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] == "/metrics":
+                    self.reply(200, CONTENT_TYPE, cache.page())
+                elif self.path == "/":
+                    self.reply(200, "text/plain", b"check_brocade exporter, metrics are at /metrics\n")
+                else:
+                    self.reply(404, "text/plain", b"Not Found\n")
+
+            def reply(self, code, content_type, body):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} {format % args}")
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        host, _, port = address.rpartition(":")
+        server = Server((host, int(port)), Handler)
+        for poller in self.pollers:
+            poller.start()
+        self.logger.info(f"exporter of {len(self.pollers)} switches listening on {address}")
+        try:
+            server.serve_forever()
+        finally:
+            self.stopped.set()
+            server.server_close()
@@ -0,0 +1,186 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Item filter shared by all checks.
+
+The options --include, --exclude, --port-type, --ignore-disabled and
+--filter are compiled once into a single predicate, so checking an item
+costs the same however many patterns or port types are given.
+
+Filter expressions combine conditions on the fields of an item:
+
+    type=e-port and not name~^0/ or (vf=128 and enabled)
+
+operators are = and != (case insensitive), ~ and !~ (regular expression
+search), a field alone is true if it is set. Conditions are combined with
+and, or, not and parentheses. Values with spaces need quotes.
+"""
+
+import re
+from checkbrocade import CheckBrocadeException
+
+
+def compile_filter(args, types=None, text_fields=('type', 'name', 'alias')):
+    """
+    Returns predicate(item) -> True if the item (a dict of fields) is to be checked.
+
+    types: list of accepted type prefixes like ['e-port', 'icl'], 'all' accepts any type
+    text_fields: fields joined for the --include / --exclude match
+
+    predicate.conditions lists (fields, condition) of the parts, all of
+    them are true for a checked item. Tables evaluate a condition on few
+    fields once per distinct value, see PortTable.select().
+    """
+    conditions = []
+
+    if types and not any(t.lower() == 'all' for t in types):
+        type_re = re.compile('^(?:' + '|'.join(re.escape(t) for t in types) + ')', re.IGNORECASE)
+        conditions.append((frozenset(['type']), lambda item: type_re.match(item['type']) is not None))
+
+    exclude = getattr(args, 'exclude', None)
+    include = getattr(args, 'include', None)
+    if exclude:
+        exclude_re = re.compile(exclude)
+        conditions.append((frozenset(text_fields),
+                           lambda item: exclude_re.search(_text(item, text_fields)) is None))
+    elif include:
+        include_re = re.compile(include)
+        conditions.append((frozenset(text_fields),
+                           lambda item: include_re.search(_text(item, text_fields)) is not None))
+
+    if getattr(args, 'ignore_disabled', False):
+        conditions.append((frozenset(['enabled']), lambda item: bool(item['enabled'])))
+
+    expression = getattr(args, 'filter', None)
+    if expression:
+        condition = parse_expression(expression)
+        conditions.append((condition.fields, condition))
+
+    if not conditions:
+        predicate = lambda item: True
+    elif len(conditions) == 1:
+        predicate = conditions[0][1]
+    else:
+        parts = [c for _, c in conditions]
+        predicate = lambda item: all(c(item) for c in parts)
+    predicate.conditions = conditions
+    return predicate
+
+
+def _text(item, fields):
+    return " ".join(str(item.get(f, '')) for f in fields)
+
+
+_TOKEN = re.compile(r'''\s*(?:(\()|(\))|(!=|!~|=|~)|"((?:[^"\\]|\\.)*)"|'([^']*)'|([^\s()=!~"']+))''')
+
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise CheckBrocadeException(f"invalid filter at '{expression[pos:]}'")
+        lparen, rparen, op, dquoted, squoted, word = match.groups()
+        if lparen:
+            tokens.append(('(', lparen))
+        elif rparen:
+            tokens.append((')', rparen))
+        elif op:
+            tokens.append(('op', op))
+        elif dquoted is not None:
+            tokens.append(('value', re.sub(r'\\(.)', r'\1', dquoted)))
+        elif squoted is not None:
+            tokens.append(('value', squoted))
+        elif word.lower() in ('and', 'or', 'not'):
+            tokens.append((word.lower(), word))
+        else:
+            tokens.append(('value', word))
+        pos = match.end()
+    return tokens
+
+
+def parse_expression(expression):
+    """ compile a filter expression into predicate(item), predicate.fields are the fields used """
+    tokens = _tokenize(expression)
+    pos = 0
+    fields = set()
+
+    def peek():
+        return tokens[pos][0] if pos < len(tokens) else None
+
+    def take(kind):
+        nonlocal pos
+        if peek() != kind:
+            found = tokens[pos][1] if pos < len(tokens) else 'end'
+            raise CheckBrocadeException(f"invalid filter '{expression}': expected {kind} at {found}")
+        pos += 1
+        return tokens[pos - 1][1]
+
+    def parse_or():
+        terms = [parse_and()]
+        while peek() == 'or':
+            take('or')
+            terms.append(parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda item: any(t(item) for t in terms)
+
+    def parse_and():
+        terms = [parse_not()]
+        while peek() == 'and':
+            take('and')
+            terms.append(parse_not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda item: all(t(item) for t in terms)
+
+    def parse_not():
+        if peek() == 'not':
+            take('not')
+            term = parse_not()
+            return lambda item: not term(item)
+        return parse_atom()
+
+    def parse_atom():
+        if peek() == '(':
+            take('(')
+            term = parse_or()
+            take(')')
+            return term
+        field = take('value')
+        fields.add(field)
+        if peek() != 'op':
+            return lambda item: bool(item.get(field))
+        op = take('op')
+        value = take('value')
+        if op in ('=', '!='):
+            value = value.lower()
+            equal = op == '='
+            return lambda item: (str(item.get(field, '')).lower() == value) == equal
+        try:
+            pattern = re.compile(value)
+        except re.error as e:
+            raise CheckBrocadeException(f"invalid filter '{expression}': {value} {e}")
+        found = op == '~'
+        return lambda item: (pattern.search(str(item.get(field, ''))) is not None) == found
+
+    predicate = parse_or()
+    if pos != len(tokens):
+        raise CheckBrocadeException(f"invalid filter '{expression}': unexpected {tokens[pos][1]}")
+    predicate.fields = frozenset(fields)
+    return predicate
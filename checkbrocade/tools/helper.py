@@ -13,9 +13,15 @@
 #    You should have received a copy of the GNU Affero General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from monplugin import Range
+from monplugin import Range, Status
+import codecs
+import functools
+import json
+import os
 import re
+import tempfile
 from types import SimpleNamespace
+from checkbrocade import CheckBrocadeDeadline
 
 # Security level mapping
 def severity(level) -> None:
@@ -72,18 +78,23 @@ def compare_versions(required, current):
 
 # Include & Exclude filter
 def item_filter(args,item=None) -> None:
-    """ Filter for items like disks, sensors, etc.."""
+    """ Filter for items like disks, sensors, etc..
+    see filter.compile_filter to check many items """
     if args.exclude:
-        if re.search(args.exclude,item):
+        if _compiled(args.exclude).search(item):
             return(True)
         else:
             return(False)
     elif args.include:
-        if re.search(args.include,item):
+        if _compiled(args.include).search(item):
             return(False)
         else:
             return(True)
 
+@functools.lru_cache(maxsize=32)
+def _compiled(pattern):
+    return re.compile(pattern)
+
 # Create a Python NameSpace object from API JSON respone        
 def sanitize_key(key):
     """ replace nasty chars by _ """
@@ -155,3 +166,115 @@ def seconds_to_human(seconds: int) -> str:
             break
     
     return ", ".join(result) if result else "0 seconds"
+
+def bytes_to_human(value: float) -> str:
+    """ 1234567 -> 1.2 MB, decimal units like the port speeds """
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(value) < 1000:
+            return f"{value:.1f} {unit}" if unit != "B" else f"{value:.0f} B"
+        value /= 1000
+    return f"{value:.1f} TB"
+
+# Write a file atomically, readers see either the old or the new content
+def atomic_write(path, data, mode=0o600) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+# Parse the items of a JSON array incrementally from chunks of bytes
+def iter_json_array(chunks, key):
+    """
+    Yield the items of the first array named key in a JSON document, one
+    at a time. Only the current item and one chunk are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    chunks = iter(chunks)
+    buffer = ""
+    pos = None
+    eof = False
+
+    def more():
+        nonlocal buffer, eof
+        try:
+            buffer += utf8.decode(next(chunks))
+        except StopIteration:
+            buffer += utf8.decode(b"", final=True)
+            eof = True
+
+    # find the beginning of the array
+    while pos is None:
+        match = start.search(buffer)
+        if match:
+            pos = match.end()
+        elif eof:
+            return
+        else:
+            # keep enough to match a key split over two chunks
+            buffer = buffer[-(len(key) + 64):]
+            more()
+
+    while True:
+        # skip separators
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            more()
+        if pos >= len(buffer):
+            raise ValueError(f"unexpected end of data in array {key}")
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more()
+            continue
+        if end == len(buffer) and not eof and not isinstance(item, (dict, list)):
+            # a number might continue in the next chunk
+            more()
+            continue
+        buffer = buffer[end:]
+        pos = 0
+        yield item
+
+
+def skipped_endpoints(responses) -> list:
+    """
+    endpoints of fetch_many(..., return_exceptions=True) skipped because the
+    deadline was reached. Other failures are raised as without return_exceptions.
+    """
+    skipped = []
+    for endpoint, response in responses.items():
+        if isinstance(response, CheckBrocadeDeadline):
+            skipped.append(endpoint)
+        elif isinstance(response, Exception):
+            raise response
+    return skipped
+
+
+def partial_result(code, message, skipped):
+    """
+    (code, message) of a check missing the skipped endpoints. What was
+    evaluated stays in the output, an OK result becomes UNKNOWN as it
+    is not complete.
+    """
+    if not skipped:
+        return (code, message)
+    names = ", ".join(e.replace("rest/running/", "", 1) for e in skipped)
+    note = f"deadline reached, skipped {names}"
+    if code == Status.OK:
+        return (Status.UNKNOWN, f"{note}\n{message}" if message else note)
+    return (code, f"{message}\n{note}" if message else note)
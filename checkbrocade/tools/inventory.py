@@ -0,0 +1,82 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Inventory of switches for commands working on several hosts.
+
+INI file, one section per switch, the section name is the host_name of the
+results. Settings of [DEFAULT] apply to all switches.
+
+    [DEFAULT]
+    username = monitor
+    credentials = env:BROCADE_API_PASS
+    checks = about
+             hardware-health
+             interface-health --port-type e-port
+
+    [switch01]
+    host = 10.1.1.1
+    port = 443
+    services = about=Brocade About
+
+credentials is env:VARIABLE or file:PATH (first line is the password).
+"""
+
+import configparser
+import os
+from checkbrocade import CheckBrocadeException
+
+
+def resolve_credentials(reference: str) -> str:
+    kind, _, value = reference.partition(":")
+    if kind == "env":
+        if value not in os.environ:
+            raise CheckBrocadeException(f"environment variable {value} is not set")
+        return os.environ[value]
+    if kind == "file":
+        with open(os.path.expanduser(value)) as f:
+            return f.readline().rstrip("\n")
+    raise CheckBrocadeException(f"unknown credentials reference {reference}, use env:NAME or file:PATH")
+
+
+def _lines(value: str):
+    return [line.strip() for line in (value or "").splitlines() if line.strip()]
+
+
+def read_inventory(path: str, default_checks=None):
+    """ returns a list of dicts with name, host, port, username, password, checks and services """
+    config = configparser.ConfigParser(interpolation=None)
+    if not config.read(path):
+        raise CheckBrocadeException(f"unable to read inventory {path}")
+
+    hosts = []
+    for name in config.sections():
+        section = config[name]
+        if 'username' not in section or 'credentials' not in section:
+            raise CheckBrocadeException(f"{path} [{name}] needs username and credentials")
+        services = {}
+        for s in _lines(section.get('services')):
+            service, _, description = s.partition("=")
+            services[service.strip()] = description.strip()
+        hosts.append({
+            'name': name,
+            'host': section.get('host', name),
+            'port': section.getint('port', 443),
+            'username': section['username'],
+            'password': resolve_credentials(section['credentials']),
+            'checks': _lines(section.get('checks')) or list(default_checks or []),
+            'services': services,
+        })
+    return hosts
@@ -0,0 +1,155 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bisect
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .helper import atomic_write
+
+MAGIC = b"CBNS"
+VERSION = 1
+# magic, version, record size, records
+HEADER = struct.Struct("<4sHHI")
+# fabric id, port id, WWPN. Big endian, the byte order of the records
+# is their numeric order and records are compared as bytes.
+RECORD = struct.Struct(">IIQ")
+
+
+def login_record(fid: int, port_id: str, wwpn: str) -> bytes:
+    """ record of a login, port_id like 0a0100, wwpn like 10:00:00:00:c9:00:01:00 """
+    return RECORD.pack(fid, int(port_id, 16), int(wwpn.replace(":", ""), 16))
+
+
+def parse_record(record: bytes) -> Tuple[int, str, str]:
+    """ (fabric id, port id, WWPN) of a record """
+    fid, port_id, wwpn = RECORD.unpack(record)
+    wwpn = f"{wwpn:016x}"
+    return (fid, f"{port_id:06x}", ":".join(wwpn[i:i + 2] for i in range(0, 16, 2)))
+
+
+class LoginIndex:
+    """
+    Sorted login records in a buffer, e.g. the memory map of a baseline.
+    Records are sliced from the buffer when accessed, lookups are binary
+    searches.
+    """
+
+    def __init__(self, buffer, offset: int = 0, count: Optional[int] = None):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = (len(buffer) - offset) // RECORD.size if count is None else count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start = self.offset + i * RECORD.size
+        return bytes(self.buffer[start:start + RECORD.size])
+
+    def __contains__(self, record: bytes) -> bool:
+        i = bisect.bisect_left(self, record)
+        return i < self.count and self[i] == record
+
+    def fabric(self, fid: int) -> Iterator[bytes]:
+        """ records of the virtual fabric fid """
+        lo = bisect.bisect_left(self, RECORD.pack(fid, 0, 0))
+        hi = bisect.bisect_left(self, RECORD.pack(fid + 1, 0, 0), lo)
+        return (self[i] for i in range(lo, hi))
+
+    def __iter__(self) -> Iterator[bytes]:
+        return (self[i] for i in range(self.count))
+
+
+def diff_logins(old: Iterable[bytes], new: Iterable[bytes]) -> Tuple[List[bytes], List[bytes]]:
+    """ (missing, new) records of two sorted sequences, merged in one pass """
+    missing, added = [], []
+    old, new = iter(old), iter(new)
+    a, b = next(old, None), next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a < b):
+            missing.append(a)
+            a = next(old, None)
+        elif a is None or b < a:
+            added.append(b)
+            b = next(new, None)
+        else:
+            a, b = next(old, None), next(new, None)
+    return (missing, added)
+
+
+class LoginBaseline:
+    """
+    Name server logins of a switch in a file of sorted fixed size records,
+    memory mapped while in use. Its size is 16 bytes per login and nothing
+    but the requested records is read.
+
+    Example:
+        with LoginBaseline(path) as baseline:
+            if baseline.index is None:
+                ...                             # no baseline yet
+            missing, new = diff_logins(baseline.index.fabric(128), current)
+        LoginBaseline.write(path, records)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index: Optional[LoginIndex] = None
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self) -> Optional[LoginIndex]:
+        """ index of the baseline, None if there is none or it is not usable """
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            return None
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, count = HEADER.unpack_from(self._map)
+        if (magic, version, record_size) != (MAGIC, VERSION, RECORD.size) or \
+                size != HEADER.size + count * RECORD.size:
+            return None
+        self.index = LoginIndex(self._map, HEADER.size, count)
+        return self.index
+
+    def close(self) -> None:
+        self.index = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def write(path: str, records: Iterable[bytes]) -> int:
+        """ store records as the new baseline, returns the number of logins """
+        records = sorted(set(records))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write(path, HEADER.pack(MAGIC, VERSION, RECORD.size, len(records)) + b"".join(records))
+        return len(records)
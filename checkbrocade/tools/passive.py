@@ -0,0 +1,93 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import errno
+import os
+import random
+import string
+import time
+from typing import Optional
+
+# Submit results as Naemon / Nagios passive service check results
+
+# the core reads checkresult files named c and 6 characters only
+SPOOL_CHARACTERS = string.ascii_letters + string.digits
+
+
+def escape(output: str) -> str:
+    """ multi line output has to be submitted as one line """
+    return output.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def command_line(host: str, service: str, result, timestamp: Optional[float] = None) -> str:
+    """ external command for the command pipe """
+    timestamp = int(timestamp or time.time())
+    return (f"[{timestamp}] PROCESS_SERVICE_CHECK_RESULT;{host};{service};"
+            f"{result.code.value};{escape(result.output())}\n")
+
+
+def submit_command_file(path: str, lines) -> None:
+    """ write external commands to the naemon.cmd / nagios.cmd pipe """
+    with open(path, "a") as pipe:
+        for line in lines:
+            # one write per command, so concurrent writers do not mix lines
+            pipe.write(line)
+            pipe.flush()
+
+
+def write_checkresult(directory: str, host: str, service: str, result,
+                      start: Optional[float] = None, finish: Optional[float] = None) -> str:
+    """ drop a result file into the checkresult spool directory """
+    finish = finish or time.time()
+    start = start or finish
+    content = (
+        "### Passive Check Result File ###\n"
+        f"file_time={int(finish)}\n"
+        "\n"
+        "### Nagios Service Check Result ###\n"
+        f"# Time: {time.ctime(finish)}\n"
+        f"host_name={host}\n"
+        f"service_description={service}\n"
+        "check_type=1\n"
+        "check_options=0\n"
+        "scheduled_check=0\n"
+        "reschedule_check=0\n"
+        "latency=0.0\n"
+        f"start_time={start:.6f}\n"
+        f"finish_time={finish:.6f}\n"
+        "early_timeout=0\n"
+        "exited_ok=1\n"
+        f"return_code={result.code.value}\n"
+        f"output={escape(result.output())}\n"
+    )
+    fd, path = create_spool_file(directory)
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    # the core only reads result files with an .ok file next to them
+    open(f"{path}.ok", "w").close()
+    return path
+
+
+def create_spool_file(directory: str, attempts: int = 100):
+    """ (fd, path) of a new file cXXXXXX in directory, like mkstemp of the core """
+    for _ in range(attempts):
+        name = "c" + "".join(random.choice(SPOOL_CHARACTERS) for _ in range(6))
+        path = os.path.join(directory, name)
+        try:
+            return (os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600), path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+    raise FileExistsError(errno.EEXIST, f"no free checkresult file name in {directory}")
@@ -0,0 +1,153 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, Dict, Any, List, Callable
+from monplugin import Status
+from .helper import compare_versions, skipped_endpoints
+
+
+class Endpoint:
+    """
+    An endpoint a check needs, declared before anything is fetched.
+
+        name     key of the response in the result of Plan.fetch()
+        path     e.g. rest/running/brocade-fru/blade
+        when     condition on the api, e.g. fos_min("9.2.0"), the endpoint
+                 is left out if it is false
+        per_vf   fetched per virtual fabric with ports, the response is a dict
+                 fabric id -> response ('novf' if VF is not enabled)
+        stream   the check streams the response itself, see Plan.urls()
+    """
+
+    def __init__(self, name: str, path: str, when: Optional[Callable[[Any], bool]] = None,
+                 per_vf: bool = False, stream: bool = False):
+        self.name = name
+        self.path = path
+        self.when = when
+        self.per_vf = per_vf
+        self.stream = stream
+
+
+def fos_min(version: str):
+    """ condition of an Endpoint: FabricOS is at least version """
+    def condition(api):
+        return compare_versions(version, api.version(True))
+    condition.label = f"FOS >= {version}"
+    return condition
+
+
+class Plan:
+    """
+    The requests of a check, planned by broadcomAPI.plan(). Conditions are
+    evaluated and per_vf endpoints are expanded to one URL per virtual
+    fabric. Planning fetches what it depends on (chassis, logical switches)
+    through the memo of the api, so a chassis fetched by verify_token or
+    needed by several endpoints is requested once per run.
+
+    Example:
+        plan = api.plan([
+            Endpoint('chassis', "rest/running/brocade-chassis/chassis"),
+            Endpoint('version', "rest/running/brocade-chassis/version", when=fos_min("9.2.0")),
+        ])
+        show_plan(check, plan, args)   # exits with the requests if --show-plan
+        response = plan.fetch()        # {'chassis': ..., 'version': ...}
+    """
+
+    def __init__(self, api, endpoints: List[Endpoint]):
+        self.api = api
+        # (Endpoint, {fabric id: url}) of the endpoints to fetch
+        self.endpoints = []
+        # endpoints whose condition is false
+        self.left_out = []
+        # urls skipped at the deadline by fetch(return_exceptions=True)
+        self.skipped = []
+        known = set(api.responses or ())
+        for endpoint in endpoints:
+            if endpoint.when is not None and not endpoint.when(api):
+                api.logger.info(f"{endpoint.path} left out, {condition_label(endpoint.when)} is false")
+                self.left_out.append(endpoint)
+                continue
+            urls = api.virtual_fabrics(endpoint.path) if endpoint.per_vf else {None: endpoint.path}
+            self.endpoints.append((endpoint, urls))
+        # requests made while planning
+        self.planning = [key[0] for key in (api.responses or ()) if key not in known]
+
+    def urls(self, name: str) -> Dict[Any, str]:
+        """ fabric id -> url of the endpoint name, {None: url} without per_vf """
+        for endpoint, urls in self.endpoints:
+            if endpoint.name == name:
+                return urls
+        return {}
+
+    def requests(self) -> List[str]:
+        """ urls fetched by fetch(), without duplicates """
+        return list(dict.fromkeys(url for endpoint, urls in self.endpoints if not endpoint.stream
+                                  for url in urls.values()))
+
+    def fetch(self, return_exceptions: bool = False) -> Dict[str, Any]:
+        """
+        fetch all endpoints at once, returns name -> response. With
+        return_exceptions the endpoints skipped at the deadline are
+        left out and listed in skipped.
+        """
+        responses = self.api.fetch_many(self.requests(), return_exceptions=return_exceptions)
+        if return_exceptions:
+            self.skipped = skipped_endpoints(responses)
+        result = {}
+        for endpoint, urls in self.endpoints:
+            if endpoint.stream:
+                continue
+            fetched = {vf: responses[url] for vf, url in urls.items() if url not in self.skipped}
+            if endpoint.per_vf:
+                result[endpoint.name] = fetched
+            elif None in fetched:
+                result[endpoint.name] = fetched[None]
+        return result
+
+    def describe(self) -> List[str]:
+        """ the requests of the run, one line each """
+        lines = [f"GET {url} (planning)" for url in self.planning]
+        seen = set(self.planning)
+        for endpoint, urls in self.endpoints:
+            for vf, url in urls.items():
+                if url in seen:
+                    continue
+                seen.add(url)
+                name = endpoint.name if vf in (None, 'novf') else f"{endpoint.name} VF {vf}"
+                if endpoint.stream:
+                    name += ", streamed"
+                elif self.api.memoized(url):
+                    name += ", reused"
+                lines.append(f"GET {url} ({name})")
+        for endpoint in self.left_out:
+            lines.append(f"--- {endpoint.path} ({endpoint.name}, {condition_label(endpoint.when)} is false)")
+        return lines
+
+    def count(self) -> int:
+        """ requests made for the plan, reused responses are not requested """
+        planned = [url for url in dict.fromkeys(url for _, urls in self.endpoints for url in urls.values())
+                   if not self.api.memoized(url)]
+        return len(self.planning) + len(planned)
+
+
+def condition_label(condition) -> str:
+    return getattr(condition, 'label', getattr(condition, '__name__', 'condition'))
+
+
+def show_plan(check, plan: Plan, args):
+    """ exit with the requests of plan if --show-plan is given """
+    if not getattr(args, 'show_plan', False):
+        return
+    check.exit(Status.OK, f"{plan.count()} requests to {plan.api.base_url}\n" + "\n".join(plan.describe()))
@@ -0,0 +1,252 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import heapq
+import re
+import sys
+from array import array
+from collections import Counter
+from monplugin import Status
+
+# status by operational-status, disabled ports are WARNING in addition
+OPER_STATUS = {
+    0: Status.WARNING,   # Undefined
+    3: Status.CRITICAL,  # Offline
+    5: Status.CRITICAL,  # Faulty
+    6: Status.WARNING,   # Testing
+}
+
+
+class PortTable:
+    """
+    Fibrechannel ports of one virtual fabric as compact columns.
+
+    Only the fields the checks use are kept, numbers in arrays and strings
+    interned, so thousands of ports need little memory. Classification
+    and status are done per column with lookups for the few distinct
+    values instead of per port dict.
+
+    Example:
+        table = PortTable(response['fibrechannel'])
+        table.classify(classifier_for(api.version(True), is_director(chassis)))
+        rows = table.select(compile_filter(args, ['e-port']))
+        worst = table.worst(rows)
+    """
+
+    def __init__(self, interfaces=()):
+        self.name = []
+        self.alias = []
+        self.port_type = array('i')
+        self.port_type_string = []
+        self.oper_status = array('i')
+        self.oper_status_string = []
+        self.enabled = array('b')
+        self.port_scn = []
+        self.health = []
+        # negotiated speed in bit/s, 0 if unknown
+        self.speed = array('q')
+        # set by classify()
+        self.if_type = []
+        self.oper_state = []
+        for intf in interfaces:
+            self.append(intf)
+
+    def __len__(self):
+        return len(self.name)
+
+    def append(self, intf):
+        intern = sys.intern
+        self.name.append(intern(intf['name']))
+        self.alias.append(intf.get('user-friendly-name', ''))
+        self.port_type.append(intf.get('port-type', 0))
+        self.port_type_string.append(intern(intf.get('port-type-string', '')))
+        self.oper_status.append(intf.get('operational-status', 0))
+        self.oper_status_string.append(intern(intf.get('operational-status-string', '')))
+        self.enabled.append(1 if intf.get('is-enabled-state') else 0)
+        self.port_scn.append(intern(intf.get('port-scn', '')))
+        self.health.append(intern(intf.get('port-health', '')))
+        self.speed.append(int(intf.get('speed') or 0))
+
+    def classify(self, classifier):
+        """
+        fill the if_type and oper_state columns with a classify.PortClassifier,
+        every distinct combination of the raw fields is classified once
+        """
+        keys = list(zip(self.port_type, self.port_type_string, self.port_scn))
+        types = {k: classifier.port_type(*k) for k in set(keys)}
+        self.if_type = [types[k] for k in keys]
+        keys = list(zip(self.oper_status, self.oper_status_string))
+        states = {k: classifier.oper_state(*k) for k in set(keys)}
+        self.oper_state = [states[k] for k in keys]
+
+    def item(self, row, vf=''):
+        """ fields of a port for filters """
+        return {
+            'type': self.if_type[row],
+            'name': self.name[row],
+            'alias': self.alias[row],
+            'enabled': self.enabled[row],
+            'state': self.oper_state[row],
+            'health': self.health[row],
+            'vf': vf,
+        }
+
+    def columns(self):
+        """ columns of few distinct values by field name of item() """
+        return {'type': self.if_type, 'state': self.oper_state, 'enabled': self.enabled, 'health': self.health}
+
+    def select(self, predicate, vf=''):
+        """
+        rows to check, predicate(item) from filter.compile_filter.
+        Conditions on type, state, enabled, health and vf are evaluated
+        once per distinct value of their columns, an item is built only for
+        the rows left for the other conditions (e.g. --include on names).
+        """
+        conditions = getattr(predicate, 'conditions', None)
+        if conditions is None:
+            return array('I', [i for i in range(len(self.name)) if predicate(self.item(i, vf))])
+
+        columns = self.columns()
+        rows = range(len(self.name))
+        remaining = []
+        for fields, condition in conditions:
+            names = sorted(fields - {'vf'})
+            if not set(names) <= set(columns):
+                remaining.append(condition)
+                continue
+            keys = list(zip(*(columns[n] for n in names))) if names else [()] * len(self.name)
+            accepted = {}
+            for key in set(keys[i] for i in rows):
+                item = dict(zip(names, key), vf=vf)
+                accepted[key] = condition(item)
+            rows = [i for i in rows if accepted[keys[i]]]
+        if remaining:
+            rows = [i for i in rows if all(c(self.item(i, vf)) for c in remaining)]
+        return array('I', rows)
+
+    def statuses(self, row):
+        """ all states of a port, disabled ports get an additional WARNING """
+        status = OPER_STATUS.get(self.oper_status[row], Status.OK)
+        if not self.enabled[row]:
+            return (Status.WARNING, status)
+        return (status,)
+
+    def worst(self, rows):
+        """ worst status of the rows """
+        worst = Status.OK
+        for code in set(self.oper_status[i] for i in rows):
+            worst = max(worst, OPER_STATUS.get(code, Status.OK))
+        if worst < Status.WARNING and not all(self.enabled[i] for i in rows):
+            worst = Status.WARNING
+        return worst
+
+    def rows_with(self, rows, status):
+        """ rows having status, only these need a rendered text """
+        return [i for i in rows if status in self.statuses(i)]
+
+    def admin_state(self, row):
+        return "enabled" if self.enabled[row] else "disabled"
+
+    def render(self, row, VF="", with_health=False):
+        return render(VF, self.if_type[row], self.name[row], self.alias[row], self.admin_state(row),
+                      self.oper_state[row], self.health[row] if with_health else None)
+
+    def logline(self, row, VF=""):
+        return (f"{VF}{self.if_type[row]} {self.name[row]} ({self.alias[row]}) enabled {bool(self.enabled[row])}"
+                f" / {self.oper_state[row]} {self.oper_status[row]}")
+
+
+def render(VF, if_type, name, alias, admin, state, health=None):
+    """ output line of a port """
+    text = f"{VF}{if_type} {name:5} {alias:23} {admin}/{state}"
+    if health is not None:
+        text += f" {health}"
+    return text
+
+
+class PortSummary:
+    """
+    Counts of ports per (virtual fabric, port type, admin state, oper state)
+    and the non-OK ports, at most limit of them, worst first. Ports are
+    added one at a time and not kept, so memory and output depend on the
+    number of problems instead of the number of ports.
+
+    Example:
+        summary = PortSummary(classifier, limit=20)
+        for intf in api.stream_request(endpoint, 'fibrechannel'):
+            summary.add(intf, port_filter)
+        for status, text in summary.problems():
+            check.add_message(status, text)
+    """
+
+    def __init__(self, classifier, limit=20):
+        self.classifier = classifier
+        self.limit = limit
+        self.counts = Counter()
+        self.checked = 0
+        self.problem_count = 0
+        # heap of (status value, -sequence, text), the first problems of a status are kept
+        self._problems = []
+
+    def add(self, intf, predicate, vf='', VF=""):
+        """ count the port if predicate(item) from filter.compile_filter accepts it """
+        classifier = self.classifier
+        if_type = classifier.port_type(intf.get('port-type', 0), intf.get('port-type-string', ''),
+                                       intf.get('port-scn', ''))
+        oper_status = intf.get('operational-status', 0)
+        state = classifier.oper_state(oper_status, intf.get('operational-status-string', ''))
+        enabled = 1 if intf.get('is-enabled-state') else 0
+        item = {
+            'type': if_type,
+            'name': intf['name'],
+            'alias': intf.get('user-friendly-name', ''),
+            'enabled': enabled,
+            'state': state,
+            'health': intf.get('port-health', ''),
+            'vf': vf,
+        }
+        if not predicate(item):
+            return
+        admin = "enabled" if enabled else "disabled"
+        self.checked += 1
+        self.counts[(vf, if_type, admin, state)] += 1
+
+        # disabled ports are WARNING in addition, like PortTable.statuses()
+        status = OPER_STATUS.get(oper_status, Status.OK)
+        if not enabled:
+            status = max(status, Status.WARNING)
+        if status == Status.OK:
+            return
+        self.problem_count += 1
+        if len(self._problems) >= self.limit:
+            if not self._problems or self._problems[0][0] >= status.value:
+                return
+            heapq.heappop(self._problems)
+        text = render(VF, if_type, item['name'], item['alias'], admin, state,
+                      item['health'] if classifier.strings else None)
+        heapq.heappush(self._problems, (status.value, -self.problem_count, text))
+
+    def problems(self):
+        """ (status, text) of the kept problems, worst first """
+        return [(Status(value), text) for value, _, text in sorted(self._problems, key=lambda p: (-p[0], -p[1]))]
+
+    def perfdata(self):
+        """ (label, ports) per virtual fabric, type and state """
+        for (vf, if_type, admin, state), count in sorted(self.counts.items()):
+            label = f"{if_type}_{admin}_{state}"
+            if vf:
+                label = f"vf{vf}_{label}"
+            yield (re.sub(r'[^\w-]+', '_', label).lower(), count)
+
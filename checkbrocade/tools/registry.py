@@ -0,0 +1,91 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Command registry, the command name (__cmd__) of every brocadecmd module.
+
+The Makefile generates brocadecmd/_registry.py for the zipapp:
+
+    python3 -m checkbrocade.tools.registry build/checkbrocade/brocadecmd/_registry.py
+
+Without the generated file the modules are scanned for __cmd__ with ast,
+so listing the commands never imports them.
+"""
+
+import ast
+import importlib.util
+import pkgutil
+import sys
+from typing import Dict
+
+PACKAGE = "checkbrocade.brocadecmd"
+
+
+def scan() -> Dict[str, str]:
+    """ {command: module} of the brocadecmd package, works inside a zipapp as well """
+    package = importlib.import_module(PACKAGE)
+    commands = {}
+    for _, name, is_pkg in pkgutil.iter_modules(package.__path__):
+        if is_pkg or name.startswith("_"):
+            continue
+        spec = importlib.util.find_spec(f"{PACKAGE}.{name}")
+        source = spec.loader.get_source(spec.name)
+        if source is None:
+            continue
+        for node in ast.parse(source).body:
+            if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                    and isinstance(node.targets[0], ast.Name) and node.targets[0].id == "__cmd__"):
+                try:
+                    commands[ast.literal_eval(node.value)] = name
+                except ValueError:
+                    pass
+    return commands
+
+
+def generated():
+    """ the generated registry or None """
+    try:
+        from checkbrocade.brocadecmd._registry import COMMANDS
+    except ImportError:
+        return None
+    return COMMANDS
+
+
+def commands() -> Dict[str, str]:
+    registry = generated()
+    return registry if registry is not None else scan()
+
+
+def module_for(command: str) -> str:
+    """ brocadecmd module name of a command like interface-health """
+    registry = generated()
+    if registry and command in registry:
+        return registry[command]
+    return "".join(c for c in command if c.isalnum())
+
+
+def write(path: str) -> None:
+    lines = [
+        "# generated by checkbrocade.tools.registry, do not edit",
+        "COMMANDS = {",
+    ]
+    lines += [f"    {cmd!r}: {module!r}," for cmd, module in sorted(scan().items())]
+    lines += ["}", ""]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+if __name__ == "__main__":
+    write(sys.argv[1])
@@ -0,0 +1,111 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import importlib
+import logging
+import shlex
+from monplugin import Check, Status
+from .helper import severity
+from . import registry
+
+
+class CheckResult(Exception):
+    """ Result of a brocadecmd check run in process """
+
+    def __init__(self, code: Status, message: str, perfdata: str = ""):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.perfdata = perfdata
+
+    def output(self) -> str:
+        """ plugin output as printed by Check.exit """
+        return f"{self.code.name}: {self.message}\n{self.perfdata}".rstrip("\n")
+
+
+class ResultCheck(Check):
+    """ Check which hands its result to the caller instead of printing it and exit """
+
+    def exit(self, code=Status.OK, message="OK"):
+        if isinstance(code, str):
+            code = Status[code]
+        raise CheckResult(code, message, self.get_perfdata())
+
+
+def load_command(name: str):
+    """ import the brocadecmd module of a command like interface-health """
+    try:
+        return importlib.import_module(f"checkbrocade.brocadecmd.{registry.module_for(name)}")
+    except ModuleNotFoundError as e:
+        if not e.name.startswith("checkbrocade.brocadecmd."):
+            raise e
+        raise ValueError(f"command not found: {name}")
+
+
+def run_check(name: str, args, extra=None) -> CheckResult:
+    """
+    Run the plugin() of a brocadecmd module with the standard arguments
+    (connection, session, cache, ...) of args and its own arguments in extra.
+    """
+    try:
+        module = load_command(name)
+    except ValueError as e:
+        return CheckResult(Status.UNKNOWN, f"{e}")
+
+    parser = module.get_parser()
+    argv = ["-H", args.host, "-u", args.username, f"--password={args.password}"] + list(extra or [])
+    try:
+        margs = parser.get_args(argv)
+    except SystemExit:
+        return CheckResult(Status.UNKNOWN, f"invalid arguments for {name}: {' '.join(extra or [])}")
+    for dest in parser.standard_options():
+        if hasattr(args, dest):
+            setattr(margs, dest, getattr(args, dest))
+
+    logger = logging.getLogger(module.__name__)
+    logger.disabled = not margs.verbose
+    if margs.verbose:
+        logger.setLevel(severity(margs.verbose))
+    module.args = margs
+    module.logger = logger
+
+    check = ResultCheck()
+    try:
+        module.plugin(check)
+    except CheckResult as result:
+        return result
+    except Exception as e:
+        logger.error(f"{e}")
+        return CheckResult(Status.UNKNOWN, f"{e}")
+    return CheckResult(Status.UNKNOWN, f"{name} returned no result")
+
+
+def iter_checks(args, specs):
+    """
+    Run several checks against one switch in this process. They share one
+    API session and every endpoint is fetched only once.
+    specs are command lines like "interface-health --port-type all".
+    Yields (name, CheckResult) as soon as a check is done
+    """
+    from .connect import shared_session
+    with shared_session():
+        for spec in specs:
+            name, *extra = shlex.split(spec)
+            yield (name, run_check(name, args, extra))
+
+
+def run_checks(args, specs):
+    """ like iter_checks but returns a list of (name, CheckResult) """
+    return list(iter_checks(args, specs))
@@ -0,0 +1,82 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import contextlib
+import re
+import threading
+import time
+
+
+class ApiTimer:
+    """
+    Time spent per phase of the REST API: connect (TCP and TLS), login,
+    verify, every endpoint and the JSON decode, plus requests and bytes.
+    Times of concurrent requests (fetch_many) are summed up. A new
+    connection is made within a request, so connect is part of the time
+    of that request (often login) as well.
+
+    Example:
+        with api.timer.measure("login"):
+            ...
+        api_perfdata(check, api, args)   # api_login_ms=... api_requests=...
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def measure(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def count(self, received: int = 0):
+        """ one request with received bytes """
+        with self._lock:
+            self.requests += 1
+            self.bytes += received
+
+    def received(self, received: int):
+        with self._lock:
+            self.bytes += received
+
+
+def endpoint_phase(endpoint: str) -> str:
+    """ rest/running/brocade-interface/fibrechannel?vf-id=1 -> fibrechannel """
+    name = endpoint.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    return re.sub(r'\W', '_', name)
+
+
+def api_perfdata(check, api, args):
+    """ add the timing of api as perfdata if --api-perfdata is given """
+    if not getattr(args, 'api_perfdata', False) or api is None:
+        return
+    timer = api.timer
+    with timer._lock:
+        phases = dict(timer.phases)
+        requests, received = timer.requests, timer.bytes
+    for phase, seconds in phases.items():
+        check.add_perfdata(label=f"api_{phase}_ms", value=round(seconds * 1000, 1), uom="ms")
+    check.add_perfdata(label="api_requests", value=requests)
+    check.add_perfdata(label="api_bytes", value=received, uom="B")
@@ -0,0 +1,301 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Worker mode, checks served by a long running process over a Unix socket.
+
+    check_brocade worker --socket /run/check_brocade.sock
+
+With CHECK_BROCADE_SOCKET set, check_brocade forwards its command line to
+the worker and prints the output and exits with the code of the check,
+command definitions stay the same. If the worker is not reachable the
+check runs in the calling process as before.
+
+One request is a JSON line {"argv": [...], "env": {...}}, the reply a JSON
+object {"stdout": ..., "stderr": ..., "code": ...}.
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+# these run several checks or processes themselves
+LOCAL_COMMANDS = ("worker", "batch", "bundle", "exporter")
+# environment of the client used by a check
+FORWARD_ENV = ("BROCADE_API_PASS", "TIMEOUT")
+
+
+def forward(path: str, argv: List[str], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """ run argv by the worker at path, None if no worker is listening """
+    request = {
+        'argv': argv,
+        'env': {k: os.environ[k] for k in FORWARD_ENV if k in os.environ},
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    if timeout is None:
+        timeout = int(os.environ.get("TIMEOUT", "60"))
+    # the worker answers after its own timeout
+    sock.settimeout(timeout + 5)
+    with sock:
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data.decode())
+
+
+class ThreadOutput(io.TextIOBase):
+    """
+    Replacement of sys.stdout / sys.stderr writing to a buffer of the
+    current thread while it captures, to the original stream otherwise.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self) -> io.StringIO:
+        self.local.buffer = io.StringIO()
+        return self.local.buffer
+
+    def release(self) -> str:
+        buffer = getattr(self.local, 'buffer', None)
+        self.local.buffer = None
+        return buffer.getvalue() if buffer else ""
+
+    def _target(self):
+        return getattr(self.local, 'buffer', None) or self.stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+
+class ThreadArgs:
+    """
+    The args global of a brocadecmd module in the worker. Its attributes
+    are the ones of the args of the run in the current thread, so runs of
+    the same module do not replace each other's arguments.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _bind(self, args):
+        self._local.args = args
+
+    def __getattr__(self, name):
+        return getattr(self._local.args, name)
+
+
+class Worker:
+    """
+    Runs check command lines in threads of this process.
+
+    API sessions are kept per switch (connect.keep_sessions), a background
+    thread verifies tokens idle for refresh_idle seconds so they do not
+    expire between checks. The args global of a brocadecmd module is a
+    ThreadArgs and the deadline is kept per thread, so runs of a module
+    against different switches run in parallel. The kept API holds the
+    deadline and responses of one run, runs against the same switch wait
+    for its session lock as long as their budget allows.
+    Timeouts are enforced by waiting for the run, SIGALRM only works in
+    the main thread.
+
+    Example:
+        worker = Worker(logger, threads=16)
+        reply = worker.handle({'argv': ['check_brocade', 'about', '-H', 'switch01', ...]})
+    """
+
+    def __init__(self, logger, threads: int = 16, refresh_idle: int = 300):
+        from concurrent.futures import ThreadPoolExecutor
+        from .connect import keep_sessions
+
+        self.logger = logger
+        self.refresh_idle = refresh_idle
+        self.apis = keep_sessions()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.module_args = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        self.stdout = ThreadOutput(sys.stdout)
+        self.stderr = ThreadOutput(sys.stderr)
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+        # verbose output of a check goes to its client
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, logging.StreamHandler) and handler.stream in (self.stdout.stream, self.stderr.stream):
+                handler.stream = self.stdout if handler.stream is self.stdout.stream else self.stderr
+
+        threading.Thread(target=self.refresh, name="token-refresh", daemon=True).start()
+
+    def refresh(self):
+        """ keep idle sessions alive by verifying their token """
+        import time
+        from .connect import session_lock
+        interval = max(self.refresh_idle // 4, 1)
+        while not self.stopped.wait(interval):
+            for key, api in list(self.apis.items()):
+                if not api.last_used or time.time() - api.last_used <= self.refresh_idle:
+                    continue
+                lock = session_lock(key)
+                # a run is using the session, it keeps the token alive
+                if not lock.acquire(blocking=False):
+                    continue
+                try:
+                    self.logger.info(f"refresh token of {key[0]}")
+                    api.deadline = None
+                    api.verify_token()
+                except Exception as e:
+                    self.logger.error(f"refresh of {key[0]} failed: {e}")
+                finally:
+                    lock.release()
+
+    def bind_args(self, module, args):
+        """ args of the run in this thread as the args global of module """
+        with self.lock:
+            if module.__name__ not in self.module_args:
+                self.module_args[module.__name__] = ThreadArgs()
+                module.args = self.module_args[module.__name__]
+        self.module_args[module.__name__]._bind(args)
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from concurrent.futures import TimeoutError
+        env = request.get('env', {})
+        timeout = int(env.get("TIMEOUT", "60"))
+        future = self.executor.submit(self.execute, request['argv'], env)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # the run goes on in its thread, its output is dropped
+            return {'stdout': "UNKNOWN - Timeout reached\n", 'stderr': "", 'code': 3}
+
+    def execute(self, argv: List[str], env: Dict[str, str]) -> Dict[str, Any]:
+        """ run one command line like main() does, with the output of this thread """
+        self.stdout.capture()
+        self.stderr.capture()
+        try:
+            code = self.run(argv, env)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) and e.code <= 3 else 3
+        except Exception as e:
+            print(f"UNKNOWN - Unhandled exception: {e}")
+            code = 3
+        return {'stdout': self.stdout.release(), 'stderr': self.stderr.release(), 'code': code}
+
+    def run(self, argv: List[str], env: Dict[str, str]) -> int:
+        from monplugin import Check, Status
+        from .helper import severity
+        import time
+        from .runner import load_command
+        from .connect import session_key, session_lock
+        from . import cli
+
+        if len(argv) < 2 or argv[1] in LOCAL_COMMANDS:
+            print(f"UNKNOWN - command not available in the worker: {' '.join(argv[1:2])}")
+            return 3
+        try:
+            module = load_command(argv[1])
+        except ValueError as e:
+            print(f"{e}")
+            return 3
+
+        extra = argv[2:]
+        if env.get("BROCADE_API_PASS"):
+            # like the env default of --password, a given -p comes later and wins
+            extra = [f"--password={env['BROCADE_API_PASS']}"] + extra
+
+        # waiting for the switch counts, like in handle()
+        cli.set_deadline(int(env.get("TIMEOUT", "60")), thread=True)
+        parser = module.get_parser()
+        parser.set_prog(f"{os.path.basename(argv[0])} {module.__cmd__}")
+        args = parser.get_args(extra)
+
+        logger = logging.getLogger(module.__name__)
+        logger.disabled = not args.verbose
+        if args.verbose:
+            logger.setLevel(severity(args.verbose))
+        self.bind_args(module, args)
+        module.logger = logger
+
+        check = Check()
+        with contextlib.ExitStack() as stack:
+            if getattr(args, 'host', None):
+                lock = session_lock(session_key(args))
+                deadline = cli.deadline()
+                if not lock.acquire(timeout=max(deadline - time.monotonic(), 0) if deadline else -1):
+                    check.exit(Status.UNKNOWN, f"{args.host} is busy with other checks, deadline reached")
+                stack.callback(lock.release)
+            try:
+                module.plugin(check)
+            except Exception as e:
+                logger.error(f"{e}")
+                check.exit(Status.UNKNOWN, f"{e}")
+        return 0
+
+    def serve(self, path: str):
+        """ serve requests on the Unix socket at path until SIGTERM / SIGINT """
+        import socketserver
+
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode())
+                    reply = worker.handle(request)
+                except Exception as e:
+                    reply = {'stdout': f"UNKNOWN - worker failed: {e}\n", 'stderr': "", 'code': 3}
+                self.wfile.write(json.dumps(reply).encode())
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(path):
+            os.remove(path)
+        # credentials are passed over the socket, it is created with mode 0600
+        umask = os.umask(0o177)
+        try:
+            server = Server(path, Handler)
+        finally:
+            os.umask(umask)
+        self.logger.info(f"worker listening on {path}")
+        try:
+            server.serve_forever()
+        finally:
+            self.stopped.set()
+            server.server_close()
+            if os.path.exists(path):
+                os.remove(path)
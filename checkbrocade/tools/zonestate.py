@@ -0,0 +1,120 @@
+#    Copyright (C) 2023  ConSol Consulting & Solutions Software GmbH
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from .helper import atomic_write
+
+# the zone digest is the sum of the zone hashes modulo 2**128
+DIGEST_SIZE = 16
+
+
+def zone_members(zone: Dict[str, Any]) -> List[str]:
+    """ sorted members of an enabled-zone, principal members of peer zones marked with * """
+    entry = zone.get('member-entry') or {}
+    members = sorted(entry.get('entry-name') or [])
+    members += sorted(f"*{m}" for m in entry.get('principal-entry-name') or [])
+    return members
+
+
+def zone_hash(zone: Dict[str, Any]) -> str:
+    """ hash of name, type and members of a zone, independent of the member order """
+    canonical = "\0".join([zone['zone-name'], str(zone.get('zone-type', ''))] + zone_members(zone))
+    return hashlib.blake2b(canonical.encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+
+class ZoneDigest:
+    """
+    Digest of a zone configuration independent of the order of zones and
+    members, computed one zone at a time while the response is streamed.
+    The hash of every zone is kept to find the changed zones.
+    """
+
+    def __init__(self):
+        self.hashes: Dict[str, str] = {}
+        self._sum = 0
+
+    def add(self, zone: Dict[str, Any]) -> str:
+        h = zone_hash(zone)
+        self.hashes[zone['zone-name']] = h
+        self._sum = (self._sum + int(h, 16)) % (1 << (8 * DIGEST_SIZE))
+        return h
+
+    def hexdigest(self) -> str:
+        return f"{self._sum:0{2 * DIGEST_SIZE}x}"
+
+
+class ZoneState:
+    """
+    State of the zone configuration per virtual fabric in two files: the
+    digests, read by every run, and the baseline with hash and members of
+    every zone, read and written only if the digest changed.
+
+    Example:
+        state = ZoneState(state_path(None, "switch01:443", "zone-config"))
+        if state.digest('novf') != digest.hexdigest():
+            baseline = state.baseline('novf')
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.baseline_path = f"{os.path.splitext(path)[0]}.zones.json"
+        self.digests: Dict[str, str] = self._read(self.path)
+        self._baselines: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, Any]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def digest(self, vf: str) -> Optional[str]:
+        return self.digests.get(vf)
+
+    def baseline(self, vf: str) -> Dict[str, Dict[str, Any]]:
+        """ zone name -> {'hash': ..., 'members': [...]} of the previous run """
+        if self._baselines is None:
+            self._baselines = self._read(self.baseline_path)
+        return self._baselines.get(vf, {})
+
+    def store(self, vf: str, digest: str, zones: Dict[str, Dict[str, Any]]):
+        self.baseline(vf)
+        self._baselines[vf] = zones
+        self.digests[vf] = digest
+
+    def save(self):
+        """ the baseline first, a digest never refers to a missing baseline """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if self._baselines is not None:
+            atomic_write(self.baseline_path, json.dumps(self._baselines, separators=(",", ":")))
+        atomic_write(self.path, json.dumps(self.digests))
+
+
+def zone_diff(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Tuple[list, list, list]:
+    """
+    (added, removed, changed) zones of two baselines, changed as
+    (zone, added members, removed members)
+    """
+    added = sorted(z for z in new if z not in old)
+    removed = sorted(z for z in old if z not in new)
+    changed = []
+    for zone in sorted(z for z in new if z in old and new[z]['hash'] != old[z]['hash']):
+        before, after = set(old[zone]['members']), set(new[zone]['members'])
+        changed.append((zone, sorted(after - before), sorted(before - after)))
+    return (added, removed, changed)